@@ -20,8 +20,19 @@
 # ======================================================================
 
 import getopt, sys
+import cProfile
 import os.path
 from util.TreeBuilder import TreeBuilder, Traverse
+from util.CallbackType import loadCallback, isChainable
+from util.Parallel import ParallelTraverse
+from util.Pipeline import PipelineTraverse
+from util.FileList import gitChangedFiles, gitStagedFiles, readFileList
+from util.File import setSync
+from util.Diff import setDryRun
+from util.Events import openSink, setSink, setRecording
+from util.Stats import setEnabled, writeStats
+from util.FileCache import FileCache, DEFAULT_SIZE, digest, clearCache
+from util.Sniffer import Sniffer
 
 ########################################################################
 #
@@ -59,13 +70,45 @@ class CodeWrestler:
         print "-v, --verbose:       Run verbose"
         print ""
         print "-d, --dir:           Define directory to traverse (default: .)"
-        print "-m, --module:        Define module to use as callback module"
-        print "-o, --modopts:       Options to be passed to the callback module"
+        print "-m, --module:        Define module to use as callback module. A comma"
+        print "                     separated list runs all modules on each file"
+        print "-o, --modopts:       Options to be passed to the callback module. Use"
+        print "                     '<module>: <options>' for a single module of a list"
         print "-e, --excludes:      Define a file with additional patterns to exclude"
+        print ""
+        print "--git-changed:       Process only files changed since the given git revision"
+        print "--git-staged:        Process only files that are staged in the git index"
+        print "--stdin:             Process only the files listed on stdin, one per line"
+        print ""
+        print "-j, --jobs:          Number of worker processes (default: 1, 0: one per CPU)"
+        print "--pipeline:          Read up to n files ahead and write changed files behind"
+        print "                     in threads of their own"
+        print "--header-size:       License modules look only at the first n KB of a file"
+        print "--header-lines:      License modules stop after n lines of code"
+        print "-n, --dry-run:       Don't change any file"
+        print "--diff:              Don't change any file, write a patch with all changes"
+        print "                     to this file instead ('-' is stdout)"
+        print "--events:            Write every message of the module as a structured event"
+        print "                     to this file ('-' is stdout) instead of printing it"
+        print "--events-format:     Format of the event file: jsonl, csv or text (default:"
+        print "                     by the file name ending, else jsonl)"
+        print "--stats:             Show where the time of the run went (phases, file types,"
+        print "                     modules, slowest files) on stderr at the end"
+        print "--profile:           Run the main process under cProfile and write the"
+        print "                     profile to this file"
+        print "--fsync:             Flush every changed file to disk before it is replaced"
+        print "--max-size:          Skip files larger than n KB. '<type>:<n>' sets the"
+        print "                     limit for a single file type, can be repeated"
+        print "--no-sniff:          Also process files that look binary"
+        print ""
+        print "-c, --cache:         Skip files that have not changed since the last run"
+        print "                     and replay their results from this cache file"
+        print "--cache-size:        Maximum number of files in the cache (default: %d)" % DEFAULT_SIZE
+        print "--cache-clear:       Remove the cache file and exit"
 
     def main(self):
         try:
-            opts, args = getopt.getopt(sys.argv[1:], "d:e:hm:o:v", ["dir=", "excludes=", "help", "module=", "modopts=", "verbose" ])
+            opts, args = getopt.getopt(sys.argv[1:], "c:d:e:hj:m:no:v", ["cache=", "cache-clear", "cache-size=", "diff=", "dir=", "dry-run", "events=", "events-format=", "excludes=", "fsync", "git-changed=", "git-staged", "header-lines=", "header-size=", "help", "jobs=", "max-size=", "module=", "modopts=", "no-sniff", "pipeline=", "profile=", "stats", "stdin", "verbose" ])
         except getopt.GetoptError:
             self.usage()
             sys.exit(2)
@@ -73,13 +116,37 @@ class CodeWrestler:
         # Variable Defaults
         self.verbose = False
         self.dirtree = "."
+        self.jobs = 1
+        self.pipeline = 0
+        self.header_size = 0
+        self.header_lines = 0
+        self.sync = False
+        self.dry_run = False
+        difffilename = None
+        self.events = False
+        self.stats = False
+        profilefilename = None
+        sniff = True
+        maxsizes = []
+        eventfilename = None
+        eventformat = None
+
+        self.cache = None
+        cachefilename = None
+        cachesize = DEFAULT_SIZE
+        cacheclear = False
 
         module_name = None
         self.module_options = ''
+        self.chain_options = {}
 
         excludes = list(self.known_excludes)
         excludefilename = None
 
+        # where to get the files from if not walking the whole tree
+        filesource = None
+        revision = None
+
         for option, value in opts:
             if option in ("-h", "--help"):
                 self.usage()
@@ -96,17 +163,143 @@ class CodeWrestler:
             elif option in ("-e", "--excludes"):
                 excludefilename = value
 
+            elif option in ("-c", "--cache"):
+                cachefilename = value
+                continue
+
+            elif option == "--cache-size":
+                try:
+                    cachesize = int(value)
+                except ValueError:
+                    self.usage()
+                    sys.exit(2)
+                continue
+
+            elif option == "--cache-clear":
+                cacheclear = True
+                continue
+
+            elif option in ("--git-changed", "--git-staged", "--stdin"):
+                if filesource is not None:
+                    print "Only one of --git-changed, --git-staged and --stdin can be used"
+                    sys.exit(2)
+                filesource = option
+                revision = value
+                continue
+
+            elif option in ("-n", "--dry-run"):
+                self.dry_run = True
+                continue
+
+            elif option == "--diff":
+                self.dry_run = True
+                difffilename = value
+                continue
+
+            elif option == "--events":
+                self.events = True
+                eventfilename = value
+                continue
+
+            elif option == "--events-format":
+                eventformat = value
+                continue
+
+            elif option == "--stats":
+                self.stats = True
+                continue
+
+            elif option == "--profile":
+                profilefilename = value
+                continue
+
+            elif option == "--fsync":
+                self.sync = True
+                continue
+
+            elif option == "--no-sniff":
+                sniff = False
+                continue
+
+            elif option == "--max-size":
+                # "<type>:<size>" sets the limit for a single file type
+                type, size = None, value
+                if ':' in value:
+                    type, size = value.split(':', 1)
+                try:
+                    maxsizes.append((type, int(size) * 1024))
+                except ValueError:
+                    self.usage()
+                    sys.exit(2)
+                continue
+
+            elif option == "--header-lines":
+                try:
+                    self.header_lines = int(value)
+                except ValueError:
+                    self.usage()
+                    sys.exit(2)
+                continue
+
+            elif option == "--header-size":
+                try:
+                    self.header_size = int(value) * 1024
+                except ValueError:
+                    self.usage()
+                    sys.exit(2)
+                continue
+
+            elif option in ("-j", "--jobs"):
+                try:
+                    self.jobs = int(value)
+                except ValueError:
+                    self.usage()
+                    sys.exit(2)
+                continue
+
+            elif option == "--pipeline":
+                try:
+                    self.pipeline = int(value)
+                except ValueError:
+                    self.usage()
+                    sys.exit(2)
+                if self.pipeline <= 0:
+                    self.usage()
+                    sys.exit(2)
+                continue
+
             elif option in ("-m", "--module"):
                 module_name = value
                 continue
 
             elif option in ("-o", "--modopts"):
-                self.module_options = value.split()
+                values = value.split()
+                # "<module>: options" passes the options only to this module of a chain
+                if len(values) > 0 and values[0].endswith(':') and not values[0].startswith('-'):
+                    self.chain_options[values[0][:-1]] = values[1:]
+                else:
+                    self.module_options = values
                 continue
 
         if not os.path.isabs(self.dirtree):
             self.dirtree = os.path.abspath(self.dirtree)
 
+        if cachefilename is not None and not os.path.isabs(cachefilename):
+            cachefilename = os.path.join(self.dirtree, cachefilename)
+
+        if cacheclear:
+            if cachefilename is None:
+                print "--cache-clear needs a cache file (--cache)"
+                sys.exit(2)
+            try:
+                clearCache(cachefilename)
+            except ValueError, msg:
+                print msg
+                sys.exit(1)
+            if self.verbose:
+                print "Removed cache %s" % cachefilename
+            sys.exit()
+
         if excludefilename is not None:
             if not os.path.isabs(excludefilename):
                 excludefilename = os.path.join(self.dirtree, excludefilename)
@@ -129,37 +322,107 @@ class CodeWrestler:
         if module_name is None:
             module_name = "util.DefaultCallback"
 
-        index = module_name.find('.')
-
-        try:
-            if index < 0:
-                mod = __import__(module_name)
-            else:
-                package = module_name[:index]
-                mod = __import__(module_name, globals(), locals(), [ package ])
-        except ImportError:
-            print "Could not load Module %s" % module_name
-            sys.exit(1)
+        self.sniffer = Sniffer(sniff, self.verbose)
+        for type, size in maxsizes:
+            self.sniffer.setMaxSize(type, size)
+        if not self.sniffer.isActive():
+            self.sniffer = None
 
         try:
-            builder = getattr(mod, 'getCallback')
-            module = apply(builder, [self])
-        except AttributeError:
-            print "Module %s is not a CodeWrestler Module" % module_name
-            sys.exit(1)
+            module = loadCallback(module_name, self)
         except ValueError, msg:
             print msg
             sys.exit(1)
 
+        if self.pipeline > 0 and self.jobs != 1:
+            print "--pipeline can not be used with --jobs"
+            sys.exit(2)
+
+        if cachefilename is not None:
+            if not isChainable(module):
+                print "Module %s can not be used with a cache" % module_name
+                sys.exit(1)
+
+            # Results of the cache are only valid for the same module and options
+            options = self.chain_options.items()
+            options.sort()
+            sniffing = None
+            if self.sniffer is not None:
+                sniffing = self.sniffer.key()
+            key = digest(repr((module_name, self.module_options, options, self.verbose, self.header_size, self.header_lines, self.events, sniffing, module.cacheKey())))
+
+            self.cache = FileCache(cachefilename, key, cachesize)
+
         self.treebuilder = TreeBuilder(self.dirtree, excludes)
         self.treebuilder.setVerbose(self.verbose)
 
-        trav = Traverse(module)
+        if filesource is not None:
+            try:
+                if filesource == "--git-changed":
+                    filelist = gitChangedFiles(self.dirtree, revision)
+                elif filesource == "--git-staged":
+                    filelist = gitStagedFiles(self.dirtree)
+                else:
+                    filelist = readFileList(sys.stdin)
+            except ValueError, msg:
+                print msg
+                sys.exit(1)
+
+            self.treebuilder.setFileList(filelist)
+
+        setSync(self.sync)
+
+        diffstream = None
+        if difffilename == "-":
+            diffstream = sys.stdout
+        elif difffilename is not None:
+            try:
+                diffstream = open(difffilename, "w")
+            except IOError:
+                print "Could not write diff file %s" % difffilename
+                sys.exit(1)
+
+        setDryRun(self.dry_run, diffstream, self.dirtree)
+
+        sink = None
+        if eventfilename is not None:
+            try:
+                sink = openSink(eventfilename, eventformat)
+            except ValueError, msg:
+                print msg
+                sys.exit(1)
+            setSink(sink)
+            setRecording(True)
+
+        setEnabled(self.stats)
+
+        trav = Traverse(module, cache=self.cache, sniffer=self.sniffer)
+        if self.jobs != 1:
+            trav = ParallelTraverse(trav, module_name, self, self.jobs)
+        elif self.pipeline > 0:
+            trav = PipelineTraverse(trav, self.pipeline)
+
         try:
-            self.treebuilder.traverse(trav)
-        except ValueError, msg:
-            print msg
-            sys.exit(1)
+            try:
+                if profilefilename is None:
+                    self.treebuilder.traverse(trav)
+                else:
+                    profiler = cProfile.Profile()
+                    try:
+                        profiler.runcall(self.treebuilder.traverse, trav)
+                    finally:
+                        profiler.dump_stats(profilefilename)
+            except ValueError, msg:
+                print msg
+                sys.exit(1)
+
+            if self.stats:
+                writeStats(sys.stderr)
+        finally:
+            if diffstream is not None and diffstream is not sys.stdout:
+                diffstream.close()
+            if sink is not None:
+                sink.close()
 
 if __name__ == "__main__":
     cw = CodeWrestler()
@@ -0,0 +1,121 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+#
+# Compares license.CheckLicense with a version that compiles the license
+# patterns for every line of every file, as the module did before. Both
+# are run on a synthetic tree of Java files with Apache license headers,
+# some of them with extra text around the license lines.
+#
+# Run from the top of the source tree with
+#
+#    python -m bench.CheckLicense [number of files]
+#
+
+import os, re, sys, shutil, tempfile, time
+from StringIO import StringIO
+
+from util.TreeBuilder import TreeBuilder, Traverse
+from bench.TreeGenerator import makeTree, HEADER
+import license.CheckLicense
+
+
+class Options:
+    """the parts of the CodeWrestler object the module looks at"""
+    def __init__(self, tree=None, licensefile=None):
+        self.dirtree = tree
+        self.module_options = [ "--file=%s" % licensefile ]
+        self.verbose = False
+        self.header_size = 0
+        self.header_lines = 0
+
+class OldCheckLicense(license.CheckLicense.CheckLicense):
+    def checkBlock(self, fullfile=None, commentBlock=None):
+        space = re.compile("^\s+$")
+        for i in range(0, len(commentBlock)):
+            patt = re.compile("^(.*?)" + re.escape(self.license[i]) + "(.*?)$")
+            match = patt.search(commentBlock[i])
+            if match:
+                if match.group(1) and not space.search(match.group(1)):
+                    print "%s: line %d has leading text: %s" % (fullfile, i + 1, match.group(1))
+                if match.group(2) and not space.search(match.group(2)):
+                    print "%s: line %d has trailing text: %s" % (fullfile, i + 1, match.group(2))
+            else:
+                print "%s: line %d does not match" % (fullfile, i + 1)
+
+def javaFile(rand=None, ending=None):
+    """a Java file with the license in a block comment"""
+    lines = [ (" * " + line).rstrip() + "\n" for line in HEADER ]
+    if rand.random() < 0.1:
+        i = rand.randrange(0, len(lines))
+        lines[i] = "XX" + lines[i].rstrip('\n') + " (changed)\n"
+    return "/*\n" + "".join(lines) + " */\n\npackage bench;\n\npublic class Test\n{\n}\n"
+
+def run(module=None, tree=None, excludes=()):
+    """runs a module on the tree, returns the time taken and the output"""
+    stdout = sys.stdout
+    sys.stdout = buffer = StringIO()
+    start = time.time()
+    try:
+        TreeBuilder(tree, excludes).traverse(Traverse(module))
+    finally:
+        sys.stdout = stdout
+    return time.time() - start, buffer.getvalue()
+
+def main():
+    count = 100000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+
+    # 10 directories per level and 3 levels give 1111 directories
+    files = max(1, count // 1111)
+
+    tree = tempfile.mkdtemp(prefix="cwbench")
+    try:
+        licensefile = os.path.join(tree, "LICENSE.txt")
+        workfile = open(licensefile, "w")
+        workfile.write("".join(HEADER))
+        workfile.close()
+
+        count = makeTree(tree, 10, files, 3, 42, ('java',), javaFile)
+        print "Synthetic tree: %d files" % count
+
+        options = Options(tree, licensefile)
+        excludes = ( "^LICENSE.txt$", )
+
+        # prime the file system cache
+        run(license.CheckLicense.CheckLicense(options), tree, excludes)
+
+        oldTime, oldOutput = run(OldCheckLicense(options), tree, excludes)
+        newTime, newOutput = run(license.CheckLicense.CheckLicense(options), tree, excludes)
+
+        if oldOutput != newOutput:
+            raise ValueError("Old and new CheckLicense disagree!")
+
+        print "Patterns per line:  %8.3fs (%d lines of output)" % (oldTime, oldOutput.count("\n"))
+        print "Precompiled:        %8.3fs (%d lines of output)" % (newTime, newOutput.count("\n"))
+        print "Speedup:            %8.1fx" % (oldTime / max(newTime, 1e-6))
+    finally:
+        shutil.rmtree(tree)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+#
+# Compares the line classification of util.CommentSplitter, which uses
+# string methods, with the classification by the regular expressions of
+# the pattern definitions. Both split a corpus of generated files, with
+# lines that put blanks, line ends and near misses around the comment
+# markers, and all files in the given directories, with every comment
+# style. Any difference in the blocks is reported.
+#
+# Run from the top of the source tree with
+#
+#    python -m bench.CommentSplitter [directory ...]
+#
+
+import os, sys, copy, random, time
+from cStringIO import StringIO
+
+from util.Pattern import Pattern
+from util.CommentSplitter import CommentSplitter, CommentPart
+from util.File import load
+from bench.TreeGenerator import sourceFile, sourceEndings
+
+# lines mixed into the generated files
+fragments = (
+    "/*", "*/", "/**", " * text", "*", " */ code();", "/* one line */", "/*\t", "\t*/\r",
+    "<!--", "-->", "  <!-- text -->", "<!---->", "<%--", "--%>",
+    "#", "# text", "#!/bin/sh", "  ## velocity", "-- sql", "rem dos", "\\@echo off",
+    "code();", "", " ", "\t", "\f", "\v", "\r", "\xa0", "\x85", "\xa0/*", "*\xa0", "text */ text",
+    )
+
+def generate(count=3000, seed=42):
+    """builds count files from the source files of the tree generator, with
+    random lines from fragments and random blanks and line ends"""
+    rand = random.Random(seed)
+    files = []
+    for i in range(0, count):
+        lines = StringIO(sourceFile(rand, rand.choice(sourceEndings))).readlines()
+        for j in range(0, rand.randint(0, 20)):
+            line = rand.choice(("", " ", "\t", "  ")) + rand.choice(fragments) + rand.choice(("", " ", "\t", "\r", " \r"))
+            lines.insert(rand.randint(0, len(lines)), line + "\n")
+        if rand.random() < 0.2:
+            lines = [ line.replace("\n", "\r\n") for line in lines ]
+        if len(lines) > 0 and rand.random() < 0.2:
+            lines[-1] = lines[-1].rstrip("\r\n")
+        files.append(lines)
+    return files
+
+def collect(directories=()):
+    """returns the lines of all files below the directories"""
+    files = []
+    for directory in directories:
+        for root, dirs, names in os.walk(directory):
+            for name in names:
+                try:
+                    files.append(load(os.path.join(root, name)))
+                except ValueError:
+                    continue
+    return files
+
+def regexDefinition(definition=None):
+    """returns a copy of a definition that classifies with its regular expressions"""
+    result = copy.copy(definition)
+    result.plain = False
+    return result
+
+def split(definition=None, files=()):
+    """splits all files, returns the time taken and the blocks"""
+    start = time.time()
+    results = []
+    for lines in files:
+        results.append(CommentSplitter(definition).parse(lines))
+    return time.time() - start, results
+
+def describe(blocks=()):
+    """returns everything the modules can see of a list of blocks"""
+    result = []
+    for block in blocks:
+        if isinstance(block, CommentPart):
+            result.append(('comment', block.prefix, block.foundOpenComment, block.foundCloseComment, list(block), block.toString()))
+        else:
+            result.append(('data', list(block), block.toString()))
+    return result
+
+def compare(name=None, files=()):
+    """splits the files with every comment style, once with string methods and once
+    with the regular expressions, and compares the blocks. Returns the number of differences"""
+    pattern = Pattern()
+    types = [ type for type in pattern.definitions.keys() if pattern.definitions[type].openComment is not None ]
+    types.sort()
+
+    oldTime = 0
+    newTime = 0
+    differences = 0
+
+    for type in types:
+        definition = pattern.getDefinition(type)
+        seconds, oldResults = split(regexDefinition(definition), files)
+        oldTime += seconds
+        seconds, newResults = split(definition, files)
+        newTime += seconds
+
+        for i in range(0, len(files)):
+            if describe(oldResults[i]) != describe(newResults[i]):
+                differences += 1
+                if differences <= 10:
+                    print "Difference for %s: %r" % (type, "".join(files[i])[:200])
+
+    print "%s: %d files, %d comment styles" % (name, len(files), len(types))
+    print "    Regular expressions: %8.3fs" % oldTime
+    print "    String methods:      %8.3fs" % newTime
+    print "    Speedup:             %8.1fx" % (oldTime / max(newTime, 1e-6))
+
+    return differences
+
+def main():
+    directories = sys.argv[1:]
+    if len(directories) == 0:
+        directories = [ "." ]
+
+    differences = compare("Generated", generate())
+    differences += compare(" ".join(directories), collect(directories))
+
+    if differences > 0:
+        raise ValueError("%d files are split differently!" % differences)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+#
+# Compares the exclude matching of the TreeBuilder with the plain loop
+# over all compiled patterns on a synthetic tree.
+#
+# Run from the top of the source tree with
+#
+#    python -m bench.Excludes
+#
+
+import os, re, shutil, tempfile, time
+
+from CodeWrestler import CodeWrestler
+from util.TreeBuilder import TreeBuilder
+from bench.TreeGenerator import makeTree
+
+def makeExcludes(count=200):
+    """builds an excludes list that looks like a real world excludes file"""
+    excludes = list(CodeWrestler.known_excludes)
+    for i in range(0, count):
+        kind = i % 4
+        if kind == 0:
+            excludes.append("^generated%d$" % i)
+        elif kind == 1:
+            excludes.append("\.ext%d$" % i)
+        elif kind == 2:
+            excludes.append("/build%d/.*$" % i)
+        else:
+            excludes.append("^Test[0-9]+Case%d\..*$" % i)
+    return excludes
+
+def loopFiles(tree=None, excludes=()):
+    """the exclude matching as the TreeBuilder did it before"""
+    ex_pattern = map(re.compile, excludes)
+    result = []
+    for root, dirs, files in os.walk(tree):
+        for dir in dirs[:]:
+            for patt in ex_pattern:
+                if patt.search(dir) or patt.search(os.path.join(root, dir)):
+                    dirs.remove(dir)
+                    break
+
+        for file in files[:]:
+            for patt in ex_pattern:
+                if patt.search(file) or patt.search(os.path.join(root, file)):
+                    files.remove(file)
+                    break
+
+        for file in files:
+            result.append((root, file))
+    return result
+
+def timeIt(function=None, *args):
+    start = time.time()
+    result = function(*args)
+    return time.time() - start, result
+
+def main():
+    tree = tempfile.mkdtemp(prefix="cwbench")
+    try:
+        count = makeTree(tree, 8, 60, 3)
+        excludes = makeExcludes(200)
+
+        print "Synthetic tree: %d files, %d exclude patterns" % (count, len(excludes))
+
+        # prime the file system cache
+        loopFiles(tree, excludes)
+
+        loopTime, loopResult = timeIt(loopFiles, tree, excludes)
+        builder = TreeBuilder(tree, excludes)
+        matcherTime, matcherResult = timeIt(lambda: list(builder.files()))
+
+        if sorted(loopResult) != sorted(matcherResult):
+            raise ValueError("Exclude matcher and pattern loop disagree!")
+
+        print "Pattern loop:    %8.3fs (%d files kept)" % (loopTime, len(loopResult))
+        print "Exclude matcher: %8.3fs (%d files kept)" % (matcherTime, len(matcherResult))
+        print "Speedup:         %8.1fx" % (loopTime / max(matcherTime, 1e-6))
+    finally:
+        shutil.rmtree(tree)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+#
+# Compares util.LicenseType with the classification as it was done with
+# one regular expression search per phrase. Both are run on a corpus of
+# generated comment blocks that mix all phrases the classification looks
+# at with near misses, and on the comment blocks of all files in the
+# given directories. Any difference in the results is reported. At the
+# end, the blocks are classified once more with 50 additional generated
+# license signatures, which must not make the classification slower.
+#
+# Run from the top of the source tree with
+#
+#    python -m bench.LicenseType [directory ...]
+#
+
+import os, re, sys, random, time, tempfile
+
+from util.Pattern import Pattern
+from util.CommentSplitter import CommentSplitter, CommentPart
+from util.File import load
+from util.LicenseSignatures import DEFAULT_FILE, setSignatures
+from util.LicenseType import LicenseType, UNKNOWN, APACHE, PUBLIC_DOMAIN, GPL, OTHER, NONE
+from util.LicenseType import APACHE_10, APACHE_11, APACHE_12, APACHE_20
+from util.LicenseType import OR_LATER, LGPL_20, LGPL_21, GPL_2
+
+# pieces of text the generated comment blocks are built from
+fragments = (
+    "Licensed under the Apache License, Version 2.0 (the \"License\")",
+    "Licensed under the Apache License", "licensed under the apache license",
+    "Version 2.0", "Version 2x0", "version 2.0", "Version 2", "version 2", "version 2.1", "version 2x1",
+    "Version 1.2", "Version 1.1", "Version 1-1", "VERSION 1.2",
+    "The Apache Software License", "the Apache Software License",
+    "Copyright (c) 2000 The Apache Group", "Copyright", "copyright", "COPYRIGHT ", "Copyrighted",
+    "The Apache Group", "the apache group",
+    "Apache Software Foundation or its licensors", "Apache Software Foundation",
+    "This file is in the public domain", "Public Domain",
+    "GNU Lesser General Public License", "GNU General Public License", "gnu general public license",
+    "or (at your option) any later version", "or  (at  your option)   any later version",
+    "Or (at your option) any later version", "or (at your option) any later",
+    " license", " License", " lisense", " li|ense", "license", "sublicense", "LICENSE",
+    " (c) ", "(c)", " (C) ", "\t(c)\t",
+    "some text", "", " ", "code();",
+    )
+
+def generate(count=50000, seed=42):
+    """builds count comment blocks from random fragments"""
+    rand = random.Random(seed)
+    definition = Pattern().getDefinition("text")
+    blocks = []
+    for i in range(0, count):
+        lines = []
+        for j in range(0, rand.randint(1, 6)):
+            lines.append(" ".join(rand.sample(fragments, rand.randint(1, 4))))
+        block = CommentPart(definition)
+        for line in lines:
+            list.append(block, line)
+        blocks.append(block)
+    return blocks
+
+def collect(directories=()):
+    """returns all comment blocks of the files below the directories"""
+    pattern = Pattern()
+    blocks = []
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            for file in files:
+                definition = pattern.getDefinition(pattern.getType(file))
+                if definition.openComment is None:
+                    continue
+                try:
+                    lines = load(os.path.join(root, file))
+                except ValueError:
+                    continue
+                for block in CommentSplitter(definition).parse(lines):
+                    if isinstance(block, CommentPart):
+                        blocks.append(block)
+    return blocks
+
+class OldLicenseType:
+    """the classification with one regular expression search per phrase"""
+    def __init__(self, comment=None):
+
+        lines = " ".join(comment)
+
+        self.isLicense = bool(re.search('\sli[c|s]ense', lines, re.I))
+        self.isCopyright = bool(re.search('\s*copyright\s', lines, re.I)) or bool(re.search('\s\(c\)\s', lines, re.I))
+
+        self.license = None
+        self.lic_type = UNKNOWN
+        self.lic_flags = NONE
+
+        if not self.isLicense:
+            return
+
+        if re.search('Licensed under the Apache License.*Version 2.0', lines):
+            self.lic_type = APACHE
+            self.lic_flags = APACHE_20
+
+            if re.search('Apache Software Foundation or its licensors', lines):
+                self.license = 'Apache 2.0a'
+            else:
+                self.license = 'Apache 2.0'
+
+        elif re.search('The Apache Software License.*Version 1.2', lines):
+            self.lic_type = APACHE
+            self.lic_flags = APACHE_12
+            self.license = 'Apache 1.2'
+
+        elif re.search('The Apache Software License.*Version 1.1', lines):
+            self.lic_type = APACHE
+            self.lic_flags = APACHE_11
+            self.license = 'Apache 1.1'
+
+        elif re.search('Copyright.*The Apache Group', lines):
+            self.lic_type = APACHE
+            self.lic_flags = APACHE_10
+            self.license = 'Apache 1.0'
+
+        elif re.search('public domain', lines, re.I):
+            self.lic_type = PUBLIC_DOMAIN
+            self.license = 'public domain'
+
+        elif re.search('GNU Lesser General Public License', lines):
+            if re.search('version 2\.1', lines):
+                self.lic_type = GPL
+                if re.search('or +\(at +your +option\) +any +later +version', lines):
+                    self.lic_flags = LGPL_21 | OR_LATER
+                    self.license =  "LGPL 2.1 or later"
+                else:
+                    self.lic_flags = LGPL_21
+                    self.license = "LGPL 2.1"
+
+            elif re.search('version 2(\.0)?', lines):
+                self.lic_type = GPL
+                if re.search('or +\(at +your +option\) +any +later +version', lines):
+                    self.lic_flags = LGPL_20 | OR_LATER
+                    self.license = "LGPL 2.0 or later"
+                else:
+                    self.lic_flags = LGPL_20
+                    self.license = "LGPL 2.0"
+
+        elif re.search('GNU General Public License', lines):
+            if re.search('Version 2(\.0)?', lines):
+                self.lic_type = GPL
+                if re.search('or +\(at +your +option\) +any +later +version', lines):
+                    self.lic_flags = GPL_2 | OR_LATER
+                    self.license =  "GPL 2 or later"
+                else:
+                    self.lic_flags = GPL_2
+                    self.license = "GPL 2"
+
+def classify(classifier=None, blocks=()):
+    """classifies all blocks, returns the time taken and the results"""
+    start = time.time()
+    results = []
+    for block in blocks:
+        lic = classifier(block)
+        if lic.lic_type == OTHER:
+            # not known to the old classifier
+            results.append((lic.isLicense, lic.isCopyright, None, UNKNOWN, NONE))
+        else:
+            results.append((lic.isLicense, lic.isCopyright, lic.license, lic.lic_type, lic.lic_flags))
+    return time.time() - start, results
+
+def compare(name=None, blocks=()):
+    """classifies the blocks with both classifiers and compares the results.
+    Returns the number of differences"""
+
+    oldTime, oldResults = classify(OldLicenseType, blocks)
+    newTime, newResults = classify(LicenseType, blocks)
+
+    differences = 0
+    licenses = {}
+    for i in range(0, len(blocks)):
+        if oldResults[i] != newResults[i]:
+            differences += 1
+            if differences <= 10:
+                print "Difference: %r" % " ".join(blocks[i])
+                print "    old: %r" % (oldResults[i],)
+                print "    new: %r" % (newResults[i],)
+        licenses[newResults[i][2]] = licenses.get(newResults[i][2], 0) + 1
+
+    print "%s: %d comment blocks" % (name, len(blocks))
+    for license, count in sorted(licenses.items()):
+        print "    %-20s %6d" % (license, count)
+
+    print "    One search per phrase: %8.3fs" % oldTime
+    print "    Single scan:           %8.3fs" % newTime
+    print "    Speedup:               %8.1fx" % (oldTime / max(newTime, 1e-6))
+
+    return differences
+
+def extraSignatures(count=50):
+    """returns count license signatures that no comment block matches"""
+    sections = []
+    for i in range(0, count):
+        sections.append("[Extra %d]\ntokens = extralicense%d permission granted\nmatch = extralicense%d permission\n" % (i, i, i))
+    return "\n".join(sections)
+
+def scaling(blocks=()):
+    """classifies the blocks with the default signatures and with additional
+    ones, returns the ratio of the times"""
+
+    def best(repeat=3):
+        times = []
+        for i in range(0, repeat):
+            start = time.time()
+            for block in blocks:
+                LicenseType(block)
+            times.append(time.time() - start)
+        return min(times)
+
+    setSignatures(DEFAULT_FILE)
+    defaultTime = best()
+
+    fd, filename = tempfile.mkstemp(suffix=".txt")
+    try:
+        workfile = os.fdopen(fd, "w")
+        workfile.write(open(DEFAULT_FILE).read())
+        workfile.write("\n")
+        workfile.write(extraSignatures())
+        workfile.close()
+        setSignatures(filename)
+    finally:
+        os.unlink(filename)
+    extraTime = best()
+
+    setSignatures(DEFAULT_FILE)
+
+    print "Signatures: %d comment blocks" % len(blocks)
+    print "    Default signatures:    %8.3fs" % defaultTime
+    print "    50 more signatures:    %8.3fs" % extraTime
+    print "    Ratio:                 %8.2fx" % (extraTime / max(defaultTime, 1e-6))
+
+def main():
+    directories = sys.argv[1:]
+    if len(directories) == 0:
+        directories = [ "." ]
+
+    generated = generate()
+    differences = compare("Generated", generated)
+    differences += compare(" ".join(directories), collect(directories))
+    scaling(generated)
+
+    if differences > 0:
+        raise ValueError("%d blocks are classified differently!" % differences)
+
+if __name__ == "__main__":
+    main()
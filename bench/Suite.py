@@ -0,0 +1,224 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+#
+# Runs every module on a synthetic source tree and reports files/s and
+# MB/s. The modules are run through the command line of CodeWrestler.py,
+# so an older checkout can be measured on the same tree with --repo, and
+# the results can be saved and compared with the results of another
+# revision:
+#
+#    python -m bench.Suite --save=before.json --repo=/path/to/old/checkout
+#    python -m bench.Suite --compare=before.json
+#
+# Run from the top of the source tree. Options:
+#
+#    --files=n     files per directory (default 20)
+#    --dirs=n      subdirectories per directory (default 6)
+#    --depth=n     levels of subdirectories (default 3)
+#    --deep=n      length of an additional chain of nested directories (default 30)
+#    --excludes=n  number of additional exclude patterns (default 500)
+#    --repeat=n    runs per module, the fastest one counts (default 3)
+#    --module=m    run only this module (can be repeated)
+#    --repo=dir    the checkout of CodeWrestler to measure (default .)
+#    --save=file   write the results as JSON
+#    --compare=file  compare with results saved before
+#
+
+import os, sys, getopt, json, shutil, subprocess, tempfile, time
+
+from bench.TreeGenerator import makeSourceTree, HEADER
+from bench.Excludes import makeExcludes
+
+# module name and module options of every benchmark. util.DefaultCallback
+# only walks the tree and finds the file types
+MODULES = (
+    ("util.DefaultCallback", ""),
+    ("license.ListLicense", ""),
+    ("license.CheckLicense", "--file=%(license)s"),
+    ("license.ReLicense", "--file=%(license)s --existing-only"),
+    ("format.CommentFormat", ""),
+    ("format.StripBlank", ""),
+    ("java.TopFormatter", ""),
+    ("xml.TopFormatter", ""),
+    )
+
+def revision(repo=None):
+    """returns the git revision of the checkout, marked if it has changes"""
+    try:
+        git = subprocess.Popen([ "git", "describe", "--always", "--dirty" ], cwd=repo,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = git.communicate()
+    except OSError:
+        return "unknown"
+    if git.returncode != 0:
+        return "unknown"
+    return output.strip()
+
+def treeSize(tree=None):
+    """returns the number of files and bytes below tree"""
+    files = 0
+    size = 0
+    for root, dirs, names in os.walk(tree):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+def runModule(repo=None, tree=None, excludes=None, module=None, options=''):
+    """runs a module on the tree, returns the time taken"""
+    args = [ sys.executable, os.path.join(repo, "CodeWrestler.py"), "-d", tree, "-e", excludes, "-m", module ]
+    if len(options) > 0:
+        args.extend([ "-o", options ])
+
+    devnull = open(os.devnull, "w")
+    try:
+        start = time.time()
+        status = subprocess.call(args, cwd=repo, stdout=devnull, stderr=subprocess.STDOUT)
+        seconds = time.time() - start
+    finally:
+        devnull.close()
+
+    if status != 0:
+        raise ValueError("%s failed with exit code %d" % (module, status))
+    return seconds
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "", [ "compare=", "deep=", "depth=", "dirs=", "excludes=", "files=",
+                                                       "module=", "repeat=", "repo=", "save=" ])
+    except getopt.GetoptError, msg:
+        print msg
+        sys.exit(2)
+
+    files = 20
+    dirs = 6
+    depth = 3
+    deep = 30
+    excludeCount = 500
+    repeat = 3
+    modules = []
+    repo = "."
+    savefile = None
+    comparefile = None
+
+    for option, value in opts:
+        if option == "--files":
+            files = int(value)
+        elif option == "--dirs":
+            dirs = int(value)
+        elif option == "--depth":
+            depth = int(value)
+        elif option == "--deep":
+            deep = int(value)
+        elif option == "--excludes":
+            excludeCount = int(value)
+        elif option == "--repeat":
+            repeat = int(value)
+        elif option == "--module":
+            modules.append(value)
+        elif option == "--repo":
+            repo = value
+        elif option == "--save":
+            savefile = value
+        elif option == "--compare":
+            comparefile = value
+
+    repo = os.path.abspath(repo)
+
+    work = tempfile.mkdtemp(prefix="cwbench")
+    try:
+        pristine = os.path.join(work, "pristine")
+        os.mkdir(pristine)
+        makeSourceTree(pristine, dirs, files, depth, deep)
+        count, size = treeSize(pristine)
+
+        license = os.path.join(work, "LICENSE.txt")
+        workfile = open(license, "w")
+        workfile.write("".join(HEADER))
+        workfile.close()
+
+        # none of the patterns matches a generated file, they make the
+        # exclude matching work on every entry
+        excludes = os.path.join(work, "excludes")
+        workfile = open(excludes, "w")
+        workfile.write("\n".join(makeExcludes(excludeCount)[1:]) + "\n")
+        workfile.close()
+
+        results = { 'revision': revision(repo),
+                    'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+                    'python': sys.version.split()[0],
+                    'tree': { 'files': count, 'bytes': size, 'dirs': dirs, 'depth': depth,
+                              'deep': deep, 'excludes': excludeCount },
+                    'modules': {} }
+
+        print "Revision %s, %d files, %.1f MB, %d exclude patterns" % (results['revision'], count, size / 1048576.0, excludeCount)
+        print ""
+        print "%-24s %10s %10s %10s" % ("Module", "seconds", "files/s", "MB/s")
+
+        tree = os.path.join(work, "tree")
+        for module, options in MODULES:
+            if len(modules) > 0 and module not in modules:
+                continue
+
+            best = None
+            for i in range(0, repeat):
+                # modules that change files get a fresh tree every time
+                shutil.rmtree(tree, True)
+                shutil.copytree(pristine, tree)
+                seconds = runModule(repo, tree, excludes, module, options % { 'license': license })
+                if best is None or seconds < best:
+                    best = seconds
+
+            results['modules'][module] = { 'seconds': best,
+                                           'files_per_s': count / best,
+                                           'mb_per_s': size / 1048576.0 / best }
+            print "%-24s %10.3f %10.0f %10.2f" % (module, best, count / best, size / 1048576.0 / best)
+    finally:
+        shutil.rmtree(work)
+
+    if savefile is not None:
+        workfile = open(savefile, "w")
+        json.dump(results, workfile, indent=1, separators=(',', ': '), sort_keys=True)
+        workfile.write("\n")
+        workfile.close()
+
+    if comparefile is not None:
+        compare(json.load(open(comparefile)), results)
+
+def compare(old=None, new=None):
+    """prints the speedup of every module against results saved before"""
+    print ""
+    print "Compared with revision %s (%s)" % (old['revision'], old['date'])
+    if old['tree'] != new['tree']:
+        print "Warning: the trees differ, the numbers are not comparable"
+
+    print "%-24s %10s %10s %10s" % ("Module", "before", "now", "speedup")
+    for module in sorted(new['modules'].keys()):
+        if not old['modules'].has_key(module):
+            continue
+        before = old['modules'][module]['seconds']
+        now = new['modules'][module]['seconds']
+        print "%-24s %10.3f %10.3f %9.2fx" % (module, before, now, before / now)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+import os, random
+
+# file name endings used for the files of a synthetic tree
+endings = ( 'java', 'xml', 'py', 'c', 'h', 'sh', 'properties', 'txt', 'pyc', 'png', 'html', 'sql' )
+
+# file name endings of a synthetic source tree, weighted like a Java project
+sourceEndings = ( 'java', 'java', 'java', 'java', 'xml', 'xml', 'py', 'py', 'properties', 'sh', 'txt' )
+
+# the license put on top of the generated files
+HEADER = """Copyright 2005 The Benchmark Authors
+
+Licensed under the Apache License, Version 2.0 (the "License"); you
+may not use this file except in compliance with the License.
+
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+implied.  See the License for the specific language governing
+permissions and limitations under the License.
+""".splitlines(True)
+
+def makeTree(base=None, dirs=10, files=10, depth=2, seed=42, endings=endings, content=None):
+    """Builds a synthetic source tree below base. Every directory contains
+    dirs subdirectories (down to depth levels) and files files. If content
+    is given, it is called with the random generator and the file ending and
+    returns the contents of a file. Returns the number of files created"""
+
+    if base is None:
+        raise ValueError("No base directory given")
+
+    rand = random.Random(seed)
+    count = 0
+
+    for i in range(0, files):
+        ending = rand.choice(endings)
+        name = os.path.join(base, "File%d.%s" % (i, ending))
+        workfile = open(name, "w")
+        if content is None:
+            workfile.write("\n")
+        else:
+            workfile.write(content(rand, ending))
+        workfile.close()
+        count += 1
+
+    if depth > 0:
+        for i in range(0, dirs):
+            subdir = os.path.join(base, "dir%d" % i)
+            os.mkdir(subdir)
+            count += makeTree(subdir, dirs, files, depth - 1, rand.random(), endings, content)
+
+    return count
+
+def makeSourceTree(base=None, dirs=10, files=10, depth=2, deep=0, seed=42):
+    """Builds a synthetic source tree with Java files with Apache license
+    headers, XML files without <?xml header, Python files with shebang lines
+    and some other files. If deep is given, an additional chain of deep
+    nested directories with files files each is built. Returns the number
+    of files created"""
+
+    count = makeTree(base, dirs, files, depth, seed, sourceEndings, sourceFile)
+
+    rand = random.Random(seed)
+    for i in range(0, deep):
+        base = os.path.join(base, "deep%d" % i)
+        os.mkdir(base)
+        count += makeTree(base, 0, files, 0, rand.random(), sourceEndings, sourceFile)
+
+    return count
+
+def sourceFile(rand=None, ending=None):
+    """returns the contents of a generated file"""
+    if ending == 'java':
+        return javaFile(rand)
+    elif ending == 'xml':
+        return xmlFile(rand)
+    elif ending == 'py':
+        return pythonFile(rand)
+    elif ending in ('properties', 'sh'):
+        return commentedFile(rand, ending)
+    return textFile(rand)
+
+def lines(rand=None, count=10, indent=""):
+    """returns count lines of generated code. Some of them have trailing blanks"""
+    result = []
+    for i in range(0, count):
+        line = "%svalue%d = compute(%d, %d);" % (indent, i, rand.randint(0, 1000), rand.randint(0, 1000))
+        if rand.random() < 0.05:
+            line += "  "
+        result.append(line + "\n")
+    return "".join(result)
+
+def javaFile(rand=None):
+    header = "/*\n" + "".join([ (" * " + line).rstrip() + "\n" for line in HEADER ]) + " */\n"
+    body = "package org.example.bench;\n\nimport java.util.List;\nimport java.util.Map;\n\n"
+    body += "/**\n * A generated class.\n */\npublic class Generated\n{\n"
+    for i in range(0, rand.randint(2, 10)):
+        body += "    /**\n     * Method %d\n     */\n    public void method%d()\n    {\n" % (i, i)
+        body += lines(rand, rand.randint(5, 30), "        ")
+        body += "    }\n\n"
+    body += "}\n"
+
+    # some files have the license below the package statement
+    if rand.random() < 0.1:
+        return body[:body.index("\n") + 2] + header + body[body.index("\n") + 2:]
+    return header + "\n" + body
+
+def xmlFile(rand=None):
+    result = "<!--\n" + "".join([ ("  " + line).rstrip() + "\n" for line in HEADER ]) + "-->\n"
+    result += "<project name=\"generated\">\n"
+    for i in range(0, rand.randint(5, 50)):
+        result += "  <!-- target %d -->\n  <target name=\"target%d\" depends=\"init\">\n" % (i, i)
+        result += "    <echo message=\"%d\"/>\n  </target>\n" % rand.randint(0, 1000)
+    result += "</project>\n"
+    return result
+
+def pythonFile(rand=None):
+    result = "#! /usr/bin/env python\n\n"
+    result += "".join([ ("# " + line).rstrip() + "\n" for line in HEADER ])
+    result += "\nimport os, sys\n\n"
+    for i in range(0, rand.randint(2, 10)):
+        result += "def function%d():\n    # compute the values\n" % i
+        result += lines(rand, rand.randint(5, 30), "    ").replace(";", "")
+        result += "\n"
+    return result
+
+def commentedFile(rand=None, ending=None):
+    result = ""
+    if ending == 'sh':
+        result = "#! /bin/sh\n"
+    result += "".join([ ("# " + line).rstrip() + "\n" for line in HEADER ])
+    for i in range(0, rand.randint(5, 50)):
+        result += "key%d=value%d\n" % (i, rand.randint(0, 1000))
+    return result
+
+def textFile(rand=None):
+    return "".join([ "Some text, line %d\n" % i for i in range(0, rand.randint(5, 50)) ])
@@ -24,8 +24,6 @@ import getopt, re
 
 from util.CallbackType import CallbackType
 from util.Pattern import Pattern
-from util.CommentSplitter import CommentSplitter, CommentPart
-from util.File import load, save
 
 def getCallback(cw=None):
     return CommentFormat(cw)
@@ -38,31 +36,27 @@ class CommentFormat(CallbackType):
         self.pattern = Pattern()
         self.cw = cw
 
-    def callback(self, root=None, file=None, type=None):
+    def process(self, source=None):
 
-        definition = self.pattern.getDefinition(type)
+        definition = self.pattern.getDefinition(source.type)
         # types that have no openComment have no comment
         # syntax at all. Therefore it is useless to check for
         # a license.
         if definition.openComment is None:
             return
 
-        fullfile = os.path.join(root, file)
-
         if self.cw.verbose:
-            print "Formatting comments in %s (%s)..." % (file, type)
-
-        lines = load(fullfile)
+            print "Formatting comments in %s (%s)..." % (source.file, source.type)
 
         if self.cw.verbose:
-            print "%s has %d lines" % (file, len(lines))
+            print "%s has %d lines" % (source.file, len(source.getLines()))
 
-        commentSplitter = CommentSplitter(definition)
-        elementList = commentSplitter.parse(lines)
+        elementList = source.getBlocks(definition)
 
         if self.cw.verbose:
-            print "%s has %d blocks" % (file, len(elementList))
+            print "%s has %d blocks" % (source.file, len(elementList))
 
-        if elementList.toString() != "".join(lines):
-            print "%s: File reformatted" % fullfile
-            save(fullfile, elementList.toString())
+        result = elementList.changed(source.getView())
+        if result is not None:
+            self.report(source.fullfile, "reformatted", "File reformatted")
+            source.setContent(result)
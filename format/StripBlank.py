@@ -24,12 +24,22 @@ import getopt, re
 
 from util.CallbackType import CallbackType
 from util.Pattern import Pattern
-from util.CommentSplitter import CommentSplitter, CommentPart
-from util.File import load, save
 
 def getCallback(cw=None):
     return StripBlank(cw)
 
+# a line that ends in blanks. Starting the pattern with the line end lets
+# the search skip from line end to line end instead of stopping at every
+# blank inside of a line
+trailingBlanks = re.compile('\n(?<=[ \t\r\f\v]\n)')
+
+def needsStrip(content=''):
+    """returns True if StripBlank would change content: a line ends in
+    blanks, the file starts with an empty line or does not end with a line end"""
+    if len(content) == 0 or content[0] == '\n' or content[-1] != '\n':
+        return True
+    return trailingBlanks.search(content) is not None
+
 class StripBlank(CallbackType):
     """ removes spaces from the line endings """
     def __init__(self, cw=None):
@@ -38,29 +48,45 @@ class StripBlank(CallbackType):
         self.pattern = Pattern()
         self.cw = cw
 
-    def callback(self, root=None, file=None, type=None):
+    def process(self, source=None):
 
-        definition = self.pattern.getDefinition(type)
+        definition = self.pattern.getDefinition(source.type)
         # types that have no openComment have no comment
         # syntax at all. Therefore it is useless to check for
         # a license.
         if definition.openComment is None:
             return
 
-        fullfile = os.path.join(root, file)
+        # most files are clean, look at the bytes before loading any lines
+        if not needsStrip(source.getView()):
+            return
 
-        lines = load(fullfile)
+        lines = source.getLines()
 
-        result = []
+        # find the first line that changes before building any new content
+        for first in range(0, len(lines)):
+            line = lines[first]
+            if line.rstrip() + "\n" != line or (first == 0 and line.isspace()):
+                break
+        else:
+            if len(lines) > 0:
+                return
+            first = 0
 
-        for line in lines:
-            newline = line.rstrip('\n')
-            if len(result) == 0 and (len(newline) == 0 or newline.isspace()):
+        result = lines[:first]
+
+        for line in lines[first:]:
+            newline = line.rstrip()
+            if len(result) == 0 and len(newline) == 0:
                 continue
-            result.append(newline.rstrip())
+            result.append(newline + "\n")
+
+        # a file with nothing but blanks keeps a single line end
+        if len(result) == 0:
+            result.append("\n")
 
-        result = "\n".join(result) + "\n"
+        result = "".join(result)
 
-        if result != "".join(lines):
-            print "%s: File reformatted" % fullfile
-            save(fullfile, result)
+        if result != source.getContent():
+            self.report(source.fullfile, "reformatted", "File reformatted")
+            source.setContent(result)
@@ -22,9 +22,8 @@
 import os, sys
 import getopt, re
 from util.Pattern import Pattern
-from util.CommentSplitter import CommentSplitter, CommentPart, DataPart, BlockList
+from util.CommentSplitter import CommentPart, DataPart, BlockList
 from util.LicenseType import LicenseType
-from util.File import load, save
 
 from util.CallbackType import CallbackType
 
@@ -76,20 +75,17 @@ class TopFormatter(CallbackType):
         print "                      Else it is put right after the package statement."
         print ""
 
-    def callback(self, root=None, file=None, type=None):
-        if type != 'java':
+    def process(self, source=None):
+        if source.type != 'java':
             return
 
         if self.cw.verbose:
-            print "Processing %s" % file
+            print "Processing %s" % source.file
 
-        definition = self.pattern.getDefinition(type)
+        definition = self.pattern.getDefinition(source.type)
 
-        fullfile = os.path.join(root, file)
-        lines = load(fullfile)
-
-        commentSplitter = CommentSplitter(definition)
-        elementList = commentSplitter.parse(lines)
+        fullfile = source.fullfile
+        elementList = source.getBlocks(definition)
 
         commentBlock = None
         for block in elementList:
@@ -206,6 +202,7 @@ class TopFormatter(CallbackType):
                 newElements.append(dataBlock)
                 dataBlock = None
 
-        if newElements.toString() != "".join(lines):
-            print "%s: File reformatted" % fullfile
-            save(fullfile, newElements.toString())
+        result = newElements.changed(source.getView())
+        if result is not None:
+            self.report(fullfile, "reformatted", "File reformatted")
+            source.setContent(result)
@@ -22,12 +22,14 @@
 import os,sys
 import getopt, re
 
-from util.CallbackType import CallbackType
+from util.CallbackType import CallbackType, headerReadAhead
 from util.Pattern import Pattern
-from util.CommentSplitter import CommentSplitter, CommentPart
+from util.CommentSplitter import CommentPart
 from util.File import load
 from util.LicenseType import LicenseType
 
+space = re.compile("^\s+$")
+
 def getCallback(cw=None):
     return CheckLicense(cw)
 
@@ -73,6 +75,16 @@ class CheckLicense(CallbackType):
         if len(self.license) == 0:
             raise ValueError("*** License file is empty or could not be read")
 
+        # one pattern per license line, the text around it is reported
+        self.patterns = [ re.compile("^(.*?)" + re.escape(line) + "(.*?)$") for line in self.license ]
+
+
+    def readAhead(self):
+        # the license is looked for in the header only
+        return headerReadAhead(self.cw)
+
+    def cacheKey(self):
+        return "\n".join(self.license)
 
     def usage(self):
         print "Usage: license.CheckLicense"
@@ -89,55 +101,62 @@ class CheckLicense(CallbackType):
         print ""
 
 
-    def callback(self, root=None, file=None, type=None):
+    def process(self, source=None):
 
-        definition = self.pattern.getDefinition(type)
+        definition = self.pattern.getDefinition(source.type)
         # types that have no openComment have no comment
         # syntax at all. Therefore it is useless to check for
         # a license.
         if definition.openComment is None:
             return
 
-        fullfile = os.path.join(root, file)
+        fullfile = source.fullfile
 
         if self.cw.verbose:
-            print "Checking License for %s (%s)" % (file, type)
-
-        lines = load(fullfile)
+            print "Checking License for %s (%s)" % (source.file, source.type)
 
         if self.cw.verbose:
-            print "%s has %d lines" % (file, len(lines))
+            print "%s has %d lines" % (source.file, len(source.getLines()))
 
-        commentSplitter = CommentSplitter(self.pattern.getDefinition(type))
-        elementList = commentSplitter.parse(lines)
-
-        if self.cw.verbose:
-            print "%s has %d blocks" % (file, len(elementList))
+        # the blocks are split only as far as needed to find the license
+        elementList = source.iterHeaderBlocks(definition, self.cw.header_size, self.cw.header_lines)
 
         commentBlock = None
+        count = 0
         for block in elementList:
+            count += 1
             if isinstance(block, CommentPart):
                 licenseChecker = LicenseType(block)
                 if licenseChecker.isLicense or licenseChecker.isCopyright:
                     commentBlock = block
                     break
         else:
-            print "%s: No comment block found! (No copyright notice either!)" % fullfile
+            if self.cw.verbose:
+                print "%s: checked %d blocks" % (source.file, count)
+            self.report(fullfile, "no-license", "No comment block found! (No copyright notice either!)")
             return
 
+        if self.cw.verbose:
+            print "%s: license in block %d" % (source.file, count)
+
 
         if len(commentBlock) != len(self.license):
-            print "%s: line count of license block does not match: %d vs. %d lines" % (fullfile, len(commentBlock), len(self.license))
+            self.report(fullfile, "line-count", "line count of license block does not match: %d vs. %d lines" % (len(commentBlock), len(self.license)),
+                        lines=len(commentBlock), expected=len(self.license))
             return
 
-        space = re.compile("^\s+$")
+        self.checkBlock(fullfile, commentBlock)
+
+    def checkBlock(self, fullfile=None, commentBlock=None):
+        """compares a license block line by line with the license file"""
         for i in range(0, len(commentBlock)):
-            patt = re.compile("^(.*?)" + re.escape(self.license[i]) + "(.*?)$")
-            match = patt.search(commentBlock[i])
+            match = self.patterns[i].search(commentBlock[i])
             if match:
                 if match.group(1) and not space.search(match.group(1)):
-                    print "%s: line %d has leading text: %s" % (fullfile, i + 1, match.group(1))
+                    self.report(fullfile, "leading-text", "line %d has leading text: %s" % (i + 1, match.group(1)),
+                                line=i + 1, text=match.group(1))
                 if match.group(2) and not space.search(match.group(2)):
-                    print "%s: line %d has trailing text: %s" % (fullfile, i + 1, match.group(2))
+                    self.report(fullfile, "trailing-text", "line %d has trailing text: %s" % (i + 1, match.group(2)),
+                                line=i + 1, text=match.group(2))
             else:
-                print "%s: line %d does not match" % (fullfile, i + 1)
+                self.report(fullfile, "mismatch", "line %d does not match" % (i + 1), line=i + 1)
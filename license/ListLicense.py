@@ -20,17 +20,93 @@
 # ======================================================================
 
 import os,sys
+import getopt
+import csv, json
 
-from util.CallbackType import CallbackType
+from util.CallbackType import CallbackType, headerReadAhead
 from util.Pattern import Pattern
-from util.CommentSplitter import CommentSplitter, CommentPart
-from util.File import load
+from util.CommentSplitter import CommentPart
 
 from util.LicenseType import LicenseType
+from util.LicenseSignatures import getSignatures, setSignatures
+
+# names used in the inventory for files without a known license
+NO_LICENSE = "(none)"
+UNKNOWN_LICENSE = "(unknown)"
+
+# buffer size of the inventory files
+BUFFER_SIZE = 65536
 
 def getCallback(cw=None):
     return ListLicense(cw)
 
+class Inventory:
+    """Collects the license of every file of a run and counts the files
+    by license and by directory"""
+
+    def __init__(self):
+        self.files = []
+        self.licenses = {}
+        self.directories = {}
+
+    def add(self, fullfile=None, license=None, copyright=False):
+        self.files.append((fullfile, license, copyright))
+        self.licenses[license] = self.licenses.get(license, 0) + 1
+
+        directory = os.path.dirname(fullfile)
+        counts = self.directories.setdefault(directory, {})
+        counts[license] = counts.get(license, 0) + 1
+
+    def filesWith(self, license=None):
+        return [ fullfile for fullfile, lic, copyright in self.files if lic == license ]
+
+    def printSummary(self):
+        print ""
+        print "License summary: %d files" % len(self.files)
+        for license, count in sorted(self.licenses.items()):
+            print "    %-24s %6d" % (license, count)
+
+        print ""
+        print "Licenses by directory:"
+        for directory, counts in sorted(self.directories.items()):
+            print "    %s: %s" % (directory, ", ".join([ "%s %d" % item for item in sorted(counts.items()) ]))
+
+        for title, license in (("Files without a license:", NO_LICENSE),
+                               ("Files with an unknown license:", UNKNOWN_LICENSE)):
+            files = self.filesWith(license)
+            if len(files) > 0:
+                print ""
+                print title
+                for fullfile in files:
+                    print "    %s" % fullfile
+
+    def writeJson(self, filename=None):
+        workfile = self.open(filename)
+        try:
+            json.dump({ 'files': [ { 'file': fullfile, 'license': license, 'copyright': copyright }
+                                   for fullfile, license, copyright in self.files ],
+                        'licenses': self.licenses,
+                        'directories': self.directories }, workfile, indent=1, separators=(',', ': '), sort_keys=True)
+            workfile.write("\n")
+        finally:
+            workfile.close()
+
+    def writeCsv(self, filename=None):
+        workfile = self.open(filename)
+        try:
+            writer = csv.writer(workfile)
+            writer.writerow(("file", "license", "copyright"))
+            for fullfile, license, copyright in self.files:
+                writer.writerow((fullfile, license, copyright and "yes" or "no"))
+        finally:
+            workfile.close()
+
+    def open(self, filename=None):
+        try:
+            return open(filename, "wb", BUFFER_SIZE)
+        except IOError:
+            raise ValueError("%s: Could not write license inventory" % filename)
+
 class ListLicense(CallbackType):
     """checks whether a file contains a copyright or license message and reports the type of license"""
 
@@ -40,33 +116,130 @@ class ListLicense(CallbackType):
         self.cw = cw
         self.pattern = Pattern()
 
-    def callback(self, root=None, file=None, type=None):
+        self.summary = False
+        self.jsonfile = None
+        self.csvfile = None
+
+        # the license of the last file and of all files
+        self.result = None
+        self.inventory = None
+
+        try:
+            opts, args = getopt.getopt(cw.module_options, "hs:", ["csv=", "help", "json=", "signatures=", "summary"])
+        except getopt.GetoptError:
+            self.usage()
+            raise ValueError("*** Parameter Error")
+
+        for option, value in opts:
+            if option in ("-h", "--help"):
+                self.usage()
+                raise ValueError("*** Parameter Error")
+            elif option in ("-s", "--signatures"):
+                if not os.path.isabs(value):
+                    value = os.path.join(self.cw.dirtree, value)
+                setSignatures(value)
+                continue
+            elif option == "--summary":
+                self.summary = True
+                continue
+            elif option == "--json":
+                if not os.path.isabs(value):
+                    value = os.path.join(self.cw.dirtree, value)
+                self.jsonfile = value
+                continue
+            elif option == "--csv":
+                if not os.path.isabs(value):
+                    value = os.path.join(self.cw.dirtree, value)
+                self.csvfile = value
+                continue
 
-        definition = self.pattern.getDefinition(type)
+        # the inventory is only collected if something is made of it
+        if self.summary or self.jsonfile is not None or self.csvfile is not None:
+            self.inventory = Inventory()
+
+    def readAhead(self):
+        # the license is looked for in the header only
+        return headerReadAhead(self.cw)
+
+    def cacheKey(self):
+        return getSignatures().key
+
+    def usage(self):
+        print "Usage: license.ListLicense"
+        print ""
+        print "The following parameters can be supplied using the \"--modopts\" option"
+        print "of the main program:"
+        print ""
+        print "-h, --help:          Show this help"
+        print ""
+        print "-s, --signatures:    File with the signatures of additional licenses. If"
+        print "                     name is not absolute, check relative to the working"
+        print "                     directory. Default is etc/licenses.txt"
+        print "--summary:           Print the number of files per license and per directory"
+        print "                     and all files without a known license at the end"
+        print "--json:              Write the license of every file and the counts to this"
+        print "                     file as JSON. If name is not absolute, it is relative"
+        print "                     to the working directory"
+        print "--csv:               Write the license of every file to this file as CSV."
+        print "                     If name is not absolute, it is relative to the working"
+        print "                     directory"
+        print ""
+        print "With --summary, --json or --csv, the license of each file is not printed"
+        print "unless the main program runs with --verbose."
+        print ""
+
+    def drain(self):
+        result = self.result
+        self.result = None
+        if self.inventory is None:
+            return None
+        return result
+
+    def merge(self, result=None):
+        self.inventory.add(*result)
+
+    def report(self, fullfile=None, event=None, message=None, **fields):
+        """the inventory replaces the messages about every file, they are
+        only kept as events unless running verbose"""
+        if self.inventory is not None and not self.cw.verbose:
+            self.recordEvent(fullfile, event, message, **fields)
+        else:
+            CallbackType.report(self, fullfile, event, message, **fields)
+
+    def finish(self):
+        if self.inventory is None:
+            return
+        if self.summary:
+            self.inventory.printSummary()
+        if self.jsonfile is not None:
+            self.inventory.writeJson(self.jsonfile)
+        if self.csvfile is not None:
+            self.inventory.writeCsv(self.csvfile)
+
+    def process(self, source=None):
+
+        definition = self.pattern.getDefinition(source.type)
         # types that have no openComment have no comment
         # syntax at all. Therefore it is useless to check for
         # a license.
         if definition.openComment is None:
             return
 
-        fullfile = os.path.join(root, file)
+        fullfile = source.fullfile
 
         if self.cw.verbose:
-            print "Checking License for %s (%s)" % (file, type)
-
-        lines = load(fullfile)
+            print "Checking License for %s (%s)" % (source.file, source.type)
 
         if self.cw.verbose:
-            print "%s has %d lines" % (file, len(lines))
+            print "%s has %d lines" % (source.file, len(source.getLines()))
 
-        commentSplitter = CommentSplitter(self.pattern.getDefinition(type))
-        elementList = commentSplitter.parse(lines)
-
-        if self.cw.verbose:
-            print "%s has %d blocks" % (file, len(elementList))
+        # the blocks are split only as far as needed to find the license
+        elementList = source.iterHeaderBlocks(definition, self.cw.header_size, self.cw.header_lines)
 
         commentBlock = None
+        count = 0
         for block in elementList:
+            count += 1
             if isinstance(block, CommentPart):
                 licenseChecker = LicenseType(block)
 
@@ -74,16 +247,25 @@ class ListLicense(CallbackType):
                     commentBlock = block
                     break
         else:
-            print "%s: No comment block found! (No copyright notice either!)" % fullfile
+            if self.cw.verbose:
+                print "%s: checked %d blocks" % (source.file, count)
+            self.report(fullfile, "no-license", "No comment block found! (No copyright notice either!)")
+            self.result = (fullfile, NO_LICENSE, False)
             return
 
+        if self.cw.verbose:
+            print "%s: license in block %d" % (source.file, count)
+
         if not licenseChecker.isCopyright:
-            print "%s: Has no copyright" % fullfile
+            self.report(fullfile, "no-copyright", "Has no copyright")
 
         if not licenseChecker.isLicense:
-            print "%s: Has no license" % fullfile
+            self.report(fullfile, "no-license", "Has no license")
+            self.result = (fullfile, NO_LICENSE, licenseChecker.isCopyright)
         else:
             if licenseChecker.license is None:
-                print "%s: License Type is unknown" % fullfile
+                self.report(fullfile, "license", "License Type is unknown", license=None)
+                self.result = (fullfile, UNKNOWN_LICENSE, licenseChecker.isCopyright)
             else:
-                print "%s: Licensed under %s" % (fullfile, licenseChecker.license)
+                self.report(fullfile, "license", "Licensed under %s" % licenseChecker.license, license=licenseChecker.license)
+                self.result = (fullfile, licenseChecker.license, licenseChecker.isCopyright)
@@ -22,11 +22,11 @@
 import os,sys
 import getopt, re
 
-from util.CallbackType import CallbackType
+from util.CallbackType import CallbackType, headerReadAhead
 from util.Pattern import Pattern
-from util.CommentSplitter import CommentSplitter, CommentPart
+from util.CommentSplitter import CommentPart
 from util.LicenseType import LicenseType
-from util.File import load, save
+from util.File import load
 
 def getCallback(cw=None):
     return ReLicense(cw)
@@ -87,6 +87,16 @@ class ReLicense(CallbackType):
         if len(self.license) == 0:
             raise ValueError("License file is empty or could not be read")
 
+        # the license as text in the comment style of a type, by type name
+        self.licenseText = {}
+
+
+    def readAhead(self):
+        # the license is looked for in the header only
+        return headerReadAhead(self.cw)
+
+    def cacheKey(self):
+        return "\n".join(self.license)
 
     def usage(self):
         print "Usage: license.ReLicense"
@@ -106,40 +116,40 @@ class ReLicense(CallbackType):
         print "                     to use e.g. a checkstyle-license file, you may need 'java'"
         print ""
 
-    def callback(self, root=None, file=None, type=None):
+    def process(self, source=None):
 
-        definition = self.pattern.getDefinition(type)
+        definition = self.pattern.getDefinition(source.type)
         # types that have no openComment have no comment
         # syntax at all. Therefore it is useless to check for
         # a license.
         if definition.openComment is None:
             return
 
-        fullfile = os.path.join(root, file)
+        fullfile = source.fullfile
 
         if self.cw.verbose:
-            print "Checking License for %s (%s)" % (file, type)
-
-        lines = load(fullfile)
+            print "Checking License for %s (%s)" % (source.file, source.type)
 
         if self.cw.verbose:
-            print "%s has %d lines" % (file, len(lines))
+            print "%s has %d lines" % (source.file, len(source.getLines()))
 
-        commentSplitter = CommentSplitter(definition)
-        elementList = commentSplitter.parse(lines)
-
-        if self.cw.verbose:
-            print "%s has %d blocks" % (file, len(elementList))
+        # only the header is needed to find the license block, the whole
+        # file is split again if it must be changed
+        elementList = source.iterHeaderBlocks(definition, self.cw.header_size, self.cw.header_lines)
 
         commentBlock = None
         commentIndex = -1
         firstIndex = -1
-        for i in range(0, len(elementList)):
-            if isinstance(elementList[i], CommentPart):
+        firstBlock = None
+        i = -1
+        for block in elementList:
+            i += 1
+            if isinstance(block, CommentPart):
                 firstIndex = i
-                licenseChecker = LicenseType(elementList[i])
+                firstBlock = block
+                licenseChecker = LicenseType(block)
                 if licenseChecker.isLicense or licenseChecker.isCopyright:
-                    commentBlock = elementList[i]
+                    commentBlock = block
                     commentIndex = i
                     break
         else:
@@ -147,27 +157,37 @@ class ReLicense(CallbackType):
                 # if the file has no comment block, then we squeeze a new copyright block on
                 # top of it
                 if self.newOnly:
-                    elementList[:0] = [ self.license.copy(definition) ]
-                    print "%s: Added License" % fullfile
-                    save(fullfile, elementList.toString())
+                    self.report(fullfile, "added", "Added License")
+                    self.replace(source, definition, 0, 0)
                 return
             else:
                 # we did find a comment block but none of the comment blocks was actually a license
                 # block
                 commentIndex = firstIndex
-                commentBlock = elementList[firstIndex]
+                commentBlock = firstBlock
 
         licenseChecker = LicenseType(commentBlock)
         if not licenseChecker.isLicense and not licenseChecker.isCopyright:
             if self.newOnly:
-                elementList[:0] = [ self.license.copy(definition) ]
-                print "%s: Added License" % fullfile
-                save(fullfile, elementList.toString())
+                self.report(fullfile, "added", "Added License")
+                self.replace(source, definition, 0, 0)
         else:
             if self.existingOnly:
-                elementList[commentIndex] = self.license.copy(definition)
-
-                if commentBlock.toString() != elementList[commentIndex].toString():
-                    print "%s: Replaced License" % fullfile
-                    save(fullfile, elementList.toString())
+                if commentBlock.toString() != self.getLicenseText(source.type, definition):
+                    self.report(fullfile, "replaced", "Replaced License")
+                    self.replace(source, definition, commentIndex, commentIndex + 1)
+
+    def getLicenseText(self, type=None, definition=None):
+        """returns the license formatted for a type, every type is formatted only once"""
+        if not self.licenseText.has_key(type):
+            self.licenseText[type] = self.license.copy(definition).toString()
+        return self.licenseText[type]
+
+    def replace(self, source=None, definition=None, start=0, end=0):
+        """replaces the blocks from start to end of the file with the license"""
+
+        # the block list is shared with other modules, work on a copy
+        elementList = source.getBlocks(definition).copy()
+        elementList[start:end] = [ self.license.copy(definition) ]
+        source.setContent(elementList.toString())
 
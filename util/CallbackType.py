@@ -19,9 +19,203 @@
 #
 # ======================================================================
 
+import copy, time
+
+from util.SourceFile import SourceFile
+from util.Events import record
+import util.Events
+import util.Stats
+
+# how far a file is read ahead for a module that only looks at the header
+# of a file if no --header-size is given, see CallbackType.readAhead
+HEADER_READ_AHEAD = 65536
+
+def headerReadAhead(cw=None):
+    """returns readAhead for a module that reads files with iterHeaderBlocks"""
+    if cw.header_size > 0:
+        return cw.header_size
+    return HEADER_READ_AHEAD
+
+def loadCallback(module_name=None, cw=None):
+    """loads a CodeWrestler module and builds its callback object by calling
+    the getCallback() function of the module with the CodeWrestler object.
+    A comma separated list of module names builds a ModuleChain"""
+
+    if module_name is None:
+        raise ValueError("No module name given")
+
+    if module_name.find(',') >= 0:
+        return ModuleChain(cw, module_name.split(','))
+
+    index = module_name.find('.')
+
+    try:
+        if index < 0:
+            mod = __import__(module_name)
+        else:
+            package = module_name[:index]
+            mod = __import__(module_name, globals(), locals(), [ package ])
+    except ImportError:
+        raise ValueError("Could not load Module %s" % module_name)
+
+    try:
+        builder = getattr(mod, 'getCallback')
+        return apply(builder, [cw])
+    except AttributeError:
+        raise ValueError("Module %s is not a CodeWrestler Module" % module_name)
+
 class CallbackType:
+    """Base class for all CodeWrestler modules.
+
+    The callback object is built by the getCallback(cw) function of the
+    module. When running with more than one job, getCallback is called
+    again inside every worker process with the same CodeWrestler object,
+    so a module must be able to build itself from the configuration alone
+    and must not rely on state collected by callbacks in another process.
+
+    Messages about a file should be given to report, which prints them,
+    or keeps them as structured events instead if an event file is selected.
+
+    A module that collects results over all files (e.g. for a summary)
+    returns the result for the file just processed from drain. The result is
+    handed to merge of the module in the main process, also when it comes
+    from a worker process or from the cache, and finish is called once
+    after the last file."""
+
     def __init__(self, cw=None):
         """C'tor for the Callback Type"""
 
     def callback(self, root=None, file=None, type=None):
-        """callback method, is called whenever a file should be processed"""
+        """callback method, is called whenever a file should be processed. Loads
+        the file, runs process on it and writes it back if it has been changed"""
+        source = SourceFile(root, file, type)
+        self.process(source)
+        source.save()
+
+    def process(self, source=None):
+        """processes a single SourceFile. Modules that implement this method
+        instead of callback can be used in a module chain"""
+        raise ValueError("%s: Module can not be used in a module chain" % self.__class__.__name__)
+
+    def report(self, fullfile=None, event=None, message=None, **fields):
+        """prints a message about a file. If events are recorded, the message is
+        kept as an event with the given name and the additional fields instead"""
+        if util.Events.recording:
+            self.recordEvent(fullfile, event, message, **fields)
+        else:
+            print "%s: %s" % (fullfile, message)
+
+    def recordEvent(self, fullfile=None, event=None, message=None, **fields):
+        """keeps a message about a file as an event without printing it"""
+        fields['file'] = fullfile
+        fields['module'] = self.__class__.__module__
+        fields['event'] = event
+        fields['message'] = message
+        record(fields)
+
+    def getName(self):
+        """returns the name of the module, used in the run statistics"""
+        return self.__class__.__module__
+
+    def readAhead(self):
+        """returns how many bytes at the start of a file the module usually
+        reads, 0 if it reads the whole file. With --pipeline, this much of
+        every file is read ahead while the module works on the files before"""
+        return 0
+
+    def cacheKey(self):
+        """returns a string that changes whenever something besides the module
+        options changes the result of the module, e.g. the contents of a
+        template file. Used to tell cached results of different runs apart"""
+        return ''
+
+    def drain(self):
+        """returns the result collected for the last file, None if there is none.
+        The result must be picklable"""
+        return None
+
+    def merge(self, result=None):
+        """takes a result returned by drain"""
+        pass
+
+    def finish(self):
+        """called once in the main process after all files have been processed"""
+        pass
+
+def isChainable(module=None):
+    """returns True if a callback object implements process"""
+    return module.process.im_func is not CallbackType.process.im_func
+
+class ModuleChain(CallbackType):
+    """Runs a list of modules on each file. The file is loaded and split only
+    once, every module sees the changes of the modules before it and the file
+    is written at most once after the last module"""
+
+    def __init__(self, cw=None, module_names=()):
+        CallbackType.__init__(self, cw)
+
+        self.modules = []
+        self.names = []
+        for module_name in module_names:
+            module_name = module_name.strip()
+            if len(module_name) == 0:
+                continue
+
+            module = loadCallback(module_name, self.moduleConfig(cw, module_name))
+            if not isChainable(module):
+                raise ValueError("Module %s can not be used in a module chain" % module_name)
+            self.modules.append(module)
+            self.names.append(module_name)
+
+        if len(self.modules) == 0:
+            raise ValueError("No modules for the module chain given")
+
+    def moduleConfig(self, cw=None, module_name=None):
+        """returns a copy of the CodeWrestler object that holds the module
+        options given for this module with --modopts='<module>: ...'"""
+        chain_options = getattr(cw, 'chain_options', {})
+        if not chain_options.has_key(module_name):
+            return cw
+
+        config = copy.copy(cw)
+        config.module_options = chain_options[module_name]
+        return config
+
+    def process(self, source=None):
+        if util.Stats.enabled:
+            for module in self.modules:
+                start = time.time()
+                module.process(source)
+                util.Stats.addModule(module.getName(), time.time() - start)
+            return
+
+        for module in self.modules:
+            module.process(source)
+
+    def getName(self):
+        return ",".join(self.names)
+
+    def readAhead(self):
+        sizes = [ module.readAhead() for module in self.modules ]
+        if 0 in sizes:
+            return 0
+        return max(sizes)
+
+    def cacheKey(self):
+        return '\0'.join([ module.cacheKey() for module in self.modules ])
+
+    def drain(self):
+        results = [ module.drain() for module in self.modules ]
+        for result in results:
+            if result is not None:
+                return results
+        return None
+
+    def merge(self, result=None):
+        for i in range(0, len(self.modules)):
+            if result[i] is not None:
+                self.modules[i].merge(result[i])
+
+    def finish(self):
+        for module in self.modules:
+            module.finish()
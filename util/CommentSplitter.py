@@ -21,8 +21,13 @@
 
 import re
 
+from util.File import MappedLines
+
 class CommentPart(list):
     """Represents a comment block inside a file"""
+
+    __slots__ = ('pattern', 'foundCloseComment', 'foundOpenComment', 'prefix')
+
     def __init__(self, pattern=None, lines=None):
         list.__init__(self)
         if pattern is None:
@@ -42,27 +47,27 @@ class CommentPart(list):
         if self.pattern.closeComment:
             # implies that openComment is on its own line
             if self.pattern.openComment is not None:
-                match = self.pattern.openCommentMatch.search(object)
-                if match and not self.foundOpenComment:
-                    self.prefix = match.group(1) # Prefix before the first comment character
+                prefix = self.pattern.matchOpen(object)
+                if prefix is not None and not self.foundOpenComment:
+                    self.prefix = prefix # Prefix before the first comment character
                     self.foundOpenComment = True
                     return
-            if self.pattern.closeCommentMatch.search(object):
+            if self.pattern.matchClose(object):
                 self.foundCloseComment = True
                 return
 
         if self.pattern.leaderComment:
-            match = self.pattern.leaderCommentMatch.search(object)
-            if match:
+            match = self.pattern.matchLeader(object)
+            if match is not None:
                 # If we have a match and no closeComment,
                 # this implies that a leadingComment also opens the
                 # comment block because the openComment does not have
                 # to be on its own line
                 if not self.pattern.closeComment and not self.foundOpenComment:
-                    self.prefix = match.group(1) # Prefix before the first comment line
+                    self.prefix = match[0] # Prefix before the first comment line
                     self.foundOpenComment = True
 
-                object = match.group(2)
+                object = match[1]
                 if self.pattern.trailerComment:
                     match = self.pattern.trailerCommentMatch.search(object)
 
@@ -145,40 +150,134 @@ class CommentPart(list):
 
         return res
 
-class DataPart(list):
-    """Represents a non-comment / code block inside a file"""
-    def __init__(self, ignoreBlankLines=False):
-        list.__init__(self)
+class DataPart(object):
+    """Represents a non-comment / code block inside a file. The lines of
+    the block are kept as they were read, with their line ends. A block
+    that the splitter builds from a list of lines is only a range of that
+    list, a block built from a memory mapped file is a range of bytes of
+    the map. The lines are not copied until a line from somewhere else is
+    appended. Reading the block returns the lines without line ends"""
+
+    __slots__ = ('lines', 'start', 'end', 'count', 'shared', 'mapped', 'ignoreBlankLines')
+
+    def __init__(self, ignoreBlankLines=False, lines=None, start=0, mapped=False):
         self.ignoreBlankLines = ignoreBlankLines
+        self.mapped = mapped
+        self.count = 0
+
+        if lines is None:
+            self.lines = []
+            self.start = 0
+            self.shared = False
+        else:
+            self.lines = lines
+            self.start = start
+            self.shared = True
+        self.end = self.start
+
+    def __len__(self):
+        if self.mapped:
+            return self.count
+        return self.end - self.start
+
+    def __iter__(self):
+        if self.mapped:
+            lines = self.lines[self.start:self.end].split('\n')
+            if len(lines[-1]) == 0:
+                lines.pop()
+            for line in lines:
+                yield line
+            return
+
+        lines = self.lines
+        for i in xrange(self.start, self.end):
+            yield lines[i].rstrip('\n')
+
+    def __getitem__(self, index):
+        if self.mapped or isinstance(index, slice):
+            return list(self)[index]
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("block index out of range")
+        return self.lines[self.start + index].rstrip('\n')
+
+    def unshare(self):
+        """copies the lines of the block, so that lines can be added or removed"""
+        if self.shared:
+            self.lines = [ line + '\n' for line in self ]
+            self.start = 0
+            self.end = len(self.lines)
+            self.shared = False
+            self.mapped = False
+
+    def appendMapped(self, length=0):
+        """adds the next length bytes of the memory map as a line. Used by the splitter"""
+        self.end += length
+        self.count += 1
 
     def append(self, object):
         if object is None:
             raise ValueError("You cannot add None to a block!")
 
+        if self.mapped:
+            self.unshare()
+
         # ignore leading blank lines
-        if self.ignoreBlankLines and len(self) == 0 and len(object) > 0 and object.isspace():
+        if self.ignoreBlankLines and self.end == self.start and object.isspace():
+            if self.shared and self.end < len(self.lines) and self.lines[self.end] is object:
+                self.start += 1
+                self.end += 1
             return
 
-        list.append(self, object.rstrip('\n'))
+        if self.shared:
+            # the next line of the shared list just extends the range
+            if self.end < len(self.lines) and self.lines[self.end] is object:
+                self.end += 1
+                return
+
+            self.unshare()
+
+        if not object.endswith('\n'):
+            object += '\n'
+        self.lines.append(object)
+        self.end += 1
 
     def finish(self):
         if self.ignoreBlankLines:
-            for i in range(self.len(), 0, -1):
-                if self[i].isspace():
-                    del(self[i])
-                else:
-                    return
-
+            if self.mapped:
+                self.unshare()
+            while self.end > self.start and self.lines[self.end - 1].isspace():
+                self.end -= 1
+            if not self.shared:
+                del self.lines[self.end:]
+
+    def isRangeOf(self, content=None, offset=0):
+        """returns True if the text of the block is the part of the memory map
+        content that starts at offset"""
+        return (self.mapped and self.lines is content and self.start == offset
+                and self.end > self.start and self.lines[self.end - 1] == '\n')
 
     def toString(self):
-        result = []
-        for lines in self:
-            result.append(lines + "\n")
+        if self.end == self.start:
+            return ''
 
-        return ''.join(result)
+        if self.mapped:
+            result = self.lines[self.start:self.end]
+        else:
+            result = ''.join(self.lines[self.start:self.end])
+
+        # only the last line of a file can miss its line end
+        if not result.endswith('\n'):
+            result += '\n'
+        return result
 
 class BlockList(list):
     """ holds all the parts of a file """
+
+    __slots__ = ()
+
     def __init__(self):
         list.__init__(self)
 
@@ -190,12 +289,56 @@ class BlockList(list):
         if len(object) > 0:
             list.append(self, object)
 
-    def toString(self):
-        res = ''
+    def copy(self):
+        """returns a new BlockList that holds the same blocks"""
+        res = BlockList()
+        list.extend(res, self)
+        return res
+
+    def iterStrings(self):
+        """yields the text of the blocks one after the other"""
         for elements in self:
-            res += elements.toString()
+            yield elements.toString()
 
-        return res
+    def toString(self):
+        return ''.join(self.iterStrings())
+
+    def changed(self, content=''):
+        """returns the text of the blocks if it differs from content, else None.
+        content can be a string or a memory map of the file. The blocks are
+        compared one by one with content and the comparison stops at the first
+        block that differs, so for an unchanged file no text for the whole file
+        is built. Data blocks that are a range of the same memory map are not
+        compared at all"""
+        result = []
+        offset = 0
+        for i in range(0, len(self)):
+            block = self[i]
+            if isinstance(block, DataPart) and block.isRangeOf(content, offset):
+                result.append(block)
+                offset = block.end
+                continue
+
+            text = block.toString()
+            result.append(text)
+            if content[offset:offset + len(text)] != text:
+                result.extend(self[i + 1:])
+                return self.join(result)
+            offset += len(text)
+
+        if offset != len(content):
+            return self.join(result)
+        return None
+
+    def join(self, parts=()):
+        """joins strings and the text of blocks"""
+        result = []
+        for part in parts:
+            if isinstance(part, str):
+                result.append(part)
+            else:
+                result.append(part.toString())
+        return ''.join(result)
 
 
 class CommentSplitter:
@@ -213,43 +356,100 @@ class CommentSplitter:
             raise ValueError("no lines given")
 
         resultList = BlockList()
+        list.extend(resultList, self.blocks(lines))
+
+        return resultList
+
+    def newData(self, buffer=None, index=0, mapped=None, position=0):
+        """returns a new data block starting at line index of buffer or at
+        byte position of the memory map"""
+        if mapped is not None:
+            return DataPart(lines=mapped, start=position, mapped=True)
+        return DataPart(lines=buffer, start=index)
+
+    def blocks(self, lines=None, limit=0, codeLines=0):
+        """splits the lines into comment and code blocks and yields every block
+        as soon as it is complete. lines can be any iterator, it is only read
+        as far as needed. The data blocks of a list or a util.File.MappedLines
+        only refer to the lines, they do not copy them. If limit or codeLines is given, splitting stops at the
+        first line after limit bytes or after codeLines non-blank lines outside of
+        comments that is not part of a comment block"""
+
+        if lines is None:
+            raise ValueError("no lines given")
+
+        # the data blocks keep ranges of a list of lines or of a memory
+        # mapped file, lines from any other iterator are copied into the blocks
+        buffer = None
+        mapped = None
+        if isinstance(lines, list):
+            buffer = lines
+        elif isinstance(lines, MappedLines):
+            mapped = lines.map
+
+        pattern = self.pattern
         currentObject = None
+        inComment = False
+        offset = 0
+        code = 0
+        index = -1
 
         for line in lines:
-            if not isinstance(currentObject, CommentPart):
+            index += 1
+            if not inComment:
+                if (limit > 0 and offset >= limit) or (codeLines > 0 and code >= codeLines):
+                    break
+            offset += len(line)
+
+            if not inComment:
                 # This is currently a data object
-                if self.pattern.openComment is not None and self.pattern.openCommentMatch.search(line):
+                if pattern.openComment is not None and pattern.matchOpen(line) is not None:
                     if currentObject is not None:
-                        resultList.append(currentObject)
+                        currentObject.finish()
+                        if len(currentObject) > 0:
+                            yield currentObject
 
-                    currentObject = CommentPart(self.pattern)
+                    currentObject = CommentPart(pattern)
+                    inComment = True
                 else:
                     if currentObject is None:
-                        currentObject = DataPart()
+                        currentObject = self.newData(buffer, index, mapped, offset - len(line))
 
             else:
                 # This is currently a comment object
 
                 # The type has no closeComment
-                if self.pattern.closeComment is None:
+                if pattern.closeComment is None:
                     # line does matches the leaderComment: This is a line which must go
                     # into a new data object. If it matches, it will go into the comment
                     # object
-                    if not self.pattern.leaderCommentMatch.search(line):
-                        resultList.append(currentObject)
-                        currentObject = DataPart()
+                    if pattern.matchLeader(line) is None:
+                        currentObject.finish()
+                        if len(currentObject) > 0:
+                            yield currentObject
+                        currentObject = self.newData(buffer, index, mapped, offset - len(line))
+                        inComment = False
                 else:
-                    if self.pattern.closeCommentMatch.search(line):
+                    if pattern.matchClose(line):
                         # closeComment finishes the comment. The next line will go into a
                         # new object. The current line goes into the comment object
                         currentObject.append(line)
-                        resultList.append(currentObject)
+                        currentObject.finish()
+                        if len(currentObject) > 0:
+                            yield currentObject
                         currentObject = None
+                        inComment = False
                         continue
 
-            currentObject.append(line)
+            if mapped is None or inComment:
+                currentObject.append(line)
+            else:
+                currentObject.appendMapped(len(line))
+
+            if codeLines > 0 and not inComment and not line.isspace():
+                code += 1
 
         if currentObject is not None:
-            resultList.append(currentObject)
-
-        return resultList
+            currentObject.finish()
+            if len(currentObject) > 0:
+                yield currentObject
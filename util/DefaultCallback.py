@@ -21,21 +21,17 @@
 
 from util.CallbackType import CallbackType
 
-import os.path
-
 class DefaultCallback(CallbackType):
     def __init__(self, cw=None):
         CallbackType.__init__(self, cw)
         self.cw = cw
 
-    def callback(self, root=None, file=None, type=None):
-        fullfile = os.path.join(root, file)
-
+    def process(self, source=None):
         if self.cw.verbose:
-            print "%s: Is a %s file" % (fullfile, type)
+            self.report(source.fullfile, "type", "Is a %s file" % source.type, type=source.type)
         else:
-            if type is None:
-                print "%s: unknown type" % fullfile
+            if source.type is None:
+                self.report(source.fullfile, "type", "unknown type", type=None)
 
 def getCallback(cw=None):
     return DefaultCallback(cw)
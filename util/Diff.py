@@ -0,0 +1,83 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+#
+# Dry run support. If a dry run is selected, changed files are not written
+# back; a unified diff of each change is written to the diff output
+# instead. The diffs of all files together form a single patch that can be
+# applied with "patch -p1" in the traversed tree.
+#
+
+import os, difflib
+from cStringIO import StringIO
+
+dryRun = False
+output = None   # stream the diffs are written to, None drops them
+tree = '.'      # file names in the diffs are relative to this directory
+buffered = False
+
+def setDryRun(flag=False, stream=None, base='.'):
+    """selects a dry run. The diffs are written to stream if it is not None"""
+    global dryRun, output, tree, buffered
+    dryRun = flag
+    output = stream
+    tree = base
+    buffered = False
+
+def bufferDiffs(base='.'):
+    """keeps the diffs in memory until they are fetched by drainDiffs. Used
+    by worker processes that pass their diffs on to the main process"""
+    global buffered
+    setDryRun(True, StringIO(), base)
+    buffered = True
+
+def drainDiffs():
+    """returns the diffs written since the last call if they are buffered"""
+    global output
+    if not buffered:
+        return ''
+    text = output.getvalue()
+    output = StringIO()
+    return text
+
+def writeDiffs(text=''):
+    """writes diffs that were made somewhere else to the diff output"""
+    if output is not None and len(text) > 0:
+        output.write(text)
+
+def unifiedDiff(filename=None, old=(), new=()):
+    """returns the unified diff between two lists of lines as a string"""
+    name = os.path.relpath(filename, tree)
+    if os.sep != '/':
+        name = name.replace(os.sep, '/')
+
+    res = []
+    for line in difflib.unified_diff(old, new, 'a/' + name, 'b/' + name):
+        res.append(line)
+        if not line.endswith('\n'):
+            res.append('\n\\ No newline at end of file\n')
+    return ''.join(res)
+
+def writeDiff(filename=None, old=(), new=()):
+    """writes the diff of a changed file to the diff output"""
+    if output is not None:
+        output.write(unifiedDiff(filename, old, new))
@@ -0,0 +1,146 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+#
+# Structured results of the modules. A module reports what it found with
+# CallbackType.report; if an event file is selected, every report is also
+# kept as an event (a dictionary with at least file, module, event and
+# message) and written to a sink in tree order. Worker processes and the
+# cache pass the events of each file on to the main process, which is the
+# only one writing to the sink.
+#
+
+import sys
+import csv, json
+
+# buffer size of the event files
+BUFFER_SIZE = 65536
+
+# the columns of every event, all other fields follow in "details"
+COLUMNS = ('file', 'module', 'event', 'message')
+
+class TextSink:
+    """writes the message of every event, like the modules print them"""
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, event=None):
+        self.stream.write("%s: %s\n" % (event['file'], event['message']))
+
+    def close(self):
+        closeStream(self.stream)
+
+class JsonLinesSink:
+    """writes every event as a JSON object on a line of its own"""
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, event=None):
+        self.stream.write(json.dumps(event, sort_keys=True))
+        self.stream.write("\n")
+
+    def close(self):
+        closeStream(self.stream)
+
+class CsvSink:
+    """writes every event as a CSV row, the fields that are special to an
+    event are written as a JSON object in the last column"""
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.writer = csv.writer(stream)
+        self.writer.writerow(COLUMNS + ('details',))
+
+    def write(self, event=None):
+        details = dict([ item for item in event.items() if item[0] not in COLUMNS ])
+        row = [ event[column] for column in COLUMNS ]
+        if len(details) > 0:
+            row.append(json.dumps(details, sort_keys=True))
+        else:
+            row.append('')
+        self.writer.writerow(row)
+
+    def close(self):
+        closeStream(self.stream)
+
+sinks = { 'text': TextSink, 'jsonl': JsonLinesSink, 'csv': CsvSink }
+
+def closeStream(stream=None):
+    """closes the stream of a sink, stdout is only flushed"""
+    if stream is sys.stdout:
+        stream.flush()
+    else:
+        stream.close()
+
+def openSink(filename=None, format=None):
+    """opens an event file, '-' is stdout. If no format is given, it is
+    guessed from the file name: .csv is CSV, .txt is text, everything else
+    JSON Lines"""
+    if format is None:
+        if filename.endswith(".csv"):
+            format = 'csv'
+        elif filename.endswith(".txt"):
+            format = 'text'
+        else:
+            format = 'jsonl'
+
+    if not sinks.has_key(format):
+        raise ValueError("Unknown event format %s (use one of %s)" % (format, ", ".join(sorted(sinks.keys()))))
+
+    if filename == "-":
+        return sinks[format](sys.stdout)
+
+    try:
+        stream = open(filename, "wb", BUFFER_SIZE)
+    except IOError:
+        raise ValueError("%s: Could not write event file" % filename)
+
+    return sinks[format](stream)
+
+recording = False
+pending = []
+sink = None
+
+def setRecording(flag=False):
+    """selects whether reports are kept as events. Set in every process"""
+    global recording
+    recording = flag
+
+def setSink(newSink=None):
+    """selects the sink of the main process"""
+    global sink
+    sink = newSink
+
+def record(event=None):
+    if recording:
+        pending.append(event)
+
+def drainEvents():
+    """returns the events recorded since the last call"""
+    global pending
+    events = pending
+    pending = []
+    return events
+
+def writeEvents(events=()):
+    if sink is not None:
+        for event in events:
+            sink.write(event)
@@ -0,0 +1,250 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+import os, re
+
+# Characters that have a special meaning in a regular expression
+SPECIAL = ".^$*+?{}[]|()"
+
+def splitLiteral(patt=None):
+    """Tries to read an exclude pattern as a plain string. Returns a tuple
+    (literal, anchoredStart, anchoredEnd) if the pattern can be matched with
+    simple string operations or None if it needs the regular expression"""
+
+    if patt is None:
+        raise ValueError("No pattern given")
+
+    tokens = []
+    i = 0
+    while i < len(patt):
+        c = patt[i]
+        if c == '\\':
+            if i + 1 == len(patt):
+                return None
+            c = patt[i+1]
+            # \d, \s, \w, \1 and friends are no literals
+            if c.isalnum() or c == '_':
+                return None
+            tokens.append((False, c))
+            i += 2
+            continue
+        tokens.append((c in SPECIAL, c))
+        i += 1
+
+    anchoredStart = False
+    anchoredEnd = False
+
+    if tokens[:1] == [ (True, '^') ]:
+        anchoredStart = True
+        tokens = tokens[1:]
+
+    # ^.* at the start is the same as no anchor at all
+    if tokens[:2] == [ (True, '.'), (True, '*') ]:
+        anchoredStart = False
+        tokens = tokens[2:]
+
+    if tokens[-1:] == [ (True, '$') ]:
+        anchoredEnd = True
+        tokens = tokens[:-1]
+
+    # .*$ at the end is the same as no anchor at all
+    if tokens[-2:] == [ (True, '.'), (True, '*') ]:
+        anchoredEnd = False
+        tokens = tokens[:-2]
+
+    if len(tokens) == 0:
+        return None
+
+    for special, c in tokens:
+        if special:
+            return None
+
+    return ''.join([ c for special, c in tokens ]), anchoredStart, anchoredEnd
+
+class ExcludeMatcher:
+    """Matches file and directory names against the list of exclude patterns.
+
+    Every pattern is matched against the bare name and against the name
+    joined with its directory. Patterns that are just a string with
+    optional anchors are sorted into sets and tuples of names, prefixes,
+    suffixes and substrings and checked with string operations, all other
+    patterns are combined into a single regular expression"""
+
+    def __init__(self, excludes=()):
+        self.names = {}         # ^foo$
+        self.paths = {}         # ^/foo/bar$
+        self.prefixes = []      # ^foo
+        self.suffixes = []      # foo$
+        self.substrings = []    # foo
+        self.rootPrefixes = []  # ^/foo
+        self.pathPrefixes = []  # ^/foo/bar
+        self.pathSuffixes = []  # foo/bar$
+        self.pathSubstrings = [] # foo/bar
+
+        regexps = []
+        for patt in excludes:
+            # make sure that broken patterns are still reported
+            re.compile(patt)
+
+            literal = splitLiteral(patt)
+            if literal is None:
+                regexps.append(patt)
+                continue
+
+            text, anchoredStart, anchoredEnd = literal
+            hasSlash = os.sep in text
+
+            # The full path of an entry is always <directory>/<name>, so a
+            # pattern without a slash can only match the path where the
+            # bare name or the directory part would match.
+            if anchoredStart and anchoredEnd:
+                if hasSlash:
+                    self.paths[text] = True
+                else:
+                    self.names[text] = True
+            elif anchoredStart:
+                if hasSlash:
+                    self.pathPrefixes.append(text)
+                else:
+                    self.prefixes.append(text)
+                    self.rootPrefixes.append(text)
+            elif anchoredEnd:
+                if hasSlash:
+                    self.pathSuffixes.append(text)
+                else:
+                    self.suffixes.append(text)
+            else:
+                if hasSlash:
+                    self.pathSubstrings.append(text)
+                else:
+                    self.substrings.append(text)
+
+        self.prefixes = tuple(self.prefixes)
+        self.suffixes = tuple(self.suffixes)
+        self.rootPrefixes = tuple(self.rootPrefixes)
+        self.pathPrefixes = tuple(self.pathPrefixes)
+        self.pathSuffixes = tuple(self.pathSuffixes)
+
+        # all substrings are searched in a single scan
+        self.substringMatch = self.literals(self.substrings)
+        self.pathSubstringMatch = self.literals(self.pathSubstrings)
+
+        self.regexps = self.combine(regexps)
+
+        self.needPath = bool(self.paths or self.pathPrefixes or self.pathSuffixes
+                             or self.pathSubstrings or self.regexps)
+
+    def literals(self, texts=()):
+        """compiles a list of strings into a pattern that finds any of them"""
+        if len(texts) == 0:
+            return None
+        return re.compile('|'.join(map(re.escape, texts)))
+
+    def combine(self, regexps=()):
+        """Builds as few compiled patterns as possible from a list of regular
+        expressions. Patterns with back references or global flags are kept
+        on their own, because they change their meaning inside an alternation"""
+
+        single = []
+        combined = []
+        for patt in regexps:
+            if re.search(r'\\\d|\(\?P=|\(\?[iLmsux]+\)', patt):
+                single.append(re.compile(patt))
+            else:
+                combined.append(patt)
+
+        if len(combined) > 0:
+            try:
+                single.append(re.compile('|'.join([ '(?:%s)' % patt for patt in combined ])))
+            except (re.error, OverflowError, AssertionError):
+                single.extend(map(re.compile, combined))
+
+        return single
+
+    def rootExcluded(self, root=None):
+        """returns True if every entry of the directory root is excluded because
+        its path matches a pattern that does not look at the name"""
+
+        if self.rootPrefixes and root.startswith(self.rootPrefixes):
+            return True
+
+        # A substring without a slash can only match the full path of an entry
+        # if it is contained in the directory part or in the name.
+        if self.substringMatch and self.substringMatch.search(root):
+            return True
+
+        return False
+
+    def isExcluded(self, root=None, name=None, rootExcluded=None):
+        """returns True if the entry name in the directory root should be skipped"""
+
+        if rootExcluded is None:
+            rootExcluded = self.rootExcluded(root)
+
+        if rootExcluded:
+            return True
+
+        if name in self.names:
+            return True
+        if self.prefixes and name.startswith(self.prefixes):
+            return True
+        if self.suffixes and name.endswith(self.suffixes):
+            return True
+        if self.substringMatch and self.substringMatch.search(name):
+            return True
+
+        if not self.needPath:
+            return False
+
+        path = os.path.join(root, name)
+
+        if path in self.paths:
+            return True
+        if self.pathPrefixes and path.startswith(self.pathPrefixes):
+            return True
+        if self.pathSuffixes and path.endswith(self.pathSuffixes):
+            return True
+        if self.pathSubstringMatch and self.pathSubstringMatch.search(path):
+            return True
+
+        for patt in self.regexps:
+            if patt.search(name) or patt.search(path):
+                return True
+
+        return False
+
+    def filter(self, root=None, names=()):
+        """splits the entries of a directory listing into the ones to keep and the
+        ones to skip. Returns a tuple of two lists (kept, removed)"""
+
+        rootExcluded = self.rootExcluded(root)
+        if rootExcluded:
+            return [], list(names)
+
+        kept = []
+        removed = []
+        for name in names:
+            if self.isExcluded(root, name, False):
+                removed.append(name)
+            else:
+                kept.append(name)
+
+        return kept, removed
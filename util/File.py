@@ -20,6 +20,9 @@
 # ======================================================================
 
 import os, sys
+import stat, tempfile, mmap
+
+from util.Stats import timed
 
 def load(filename=None):
 
@@ -27,7 +30,7 @@ def load(filename=None):
         raise ValueError("Need a file name!")
 
     try:
-        workfile = open(filename, "r")
+        workfile = open(filename, "rb")
     except IOError:
         raise ValueError("File %s could not be opened!" % filename)
 
@@ -36,39 +39,275 @@ def load(filename=None):
 
     return lines
 
-def save(filename=None, lines=None):
+def loadContent(filename=None):
+    """returns the bytes of a file as a single string"""
 
-    if filename is None or lines is None:
-        raise ValueError("Need a filename and some content")
+    if filename is None:
+        raise ValueError("Need a file name!")
 
     try:
-        os.unlink(filename + ".bak")
-    except OSError, error:
-        if error.errno != 2:  # ENOENT
-            raise ValueError("%s: Could not write file" % filename)
+        workfile = open(filename, "rb")
+    except IOError:
+        raise ValueError("File %s could not be opened!" % filename)
+
+    try:
+        return workfile.read()
+    finally:
+        workfile.close()
 
-    os.rename(filename, filename + ".bak")
+def iterate(filename=None):
+    """returns an iterator over the lines of a file. The file is read only
+    as far as the lines are used and closed when the iterator goes away"""
+
+    if filename is None:
+        raise ValueError("Need a file name!")
 
     try:
-        workfile = open(filename, "w")
-        workfile.write(lines)
-        workfile.flush()
+        workfile = open(filename, "rb")
+    except IOError:
+        raise ValueError("File %s could not be opened!" % filename)
+
+    return readLines(workfile)
+
+def readLines(workfile=None):
+    try:
+        for line in workfile:
+            yield line
+    finally:
         workfile.close()
+
+# size of the reads of readAhead
+READ_AHEAD_BLOCK = 65536
+
+def readAhead(filename=None, size=0, keep=0):
+    """reads the first size bytes of a file, so that they are found in the
+    cache of the operating system when the file is read or mapped again.
+    Returns the first keep bytes and the number of bytes read. A file that
+    can not be read returns (None, 0), the error is left to the code that
+    reads it later"""
+
+    if filename is None:
+        raise ValueError("Need a file name!")
+
+    try:
+        workfile = open(filename, "rb")
     except IOError:
+        return None, 0
+
+    try:
         try:
-            os.unlink(filename)
-        finally:
-            pass
+            head = workfile.read(max(min(size, READ_AHEAD_BLOCK), keep))
+            done = len(head)
+            while done < size:
+                data = workfile.read(min(size - done, READ_AHEAD_BLOCK))
+                if len(data) == 0:
+                    break
+                done += len(data)
+        except IOError:
+            return None, 0
+    finally:
+        workfile.close()
 
-        os.rename(filename + ".bak", filename)
-        raise ValueError("%s: Could not write file" % filename)
+    return head[:keep], done
+
+def mapFile(filename=None):
+    """returns the contents of a file as a read only memory map. Nothing is
+    read until the map is used, and then only the pages that are touched.
+    The map supports len, indexing, slicing, find and regular expression
+    searches. An empty file can not be mapped and returns an empty string"""
+
+    if filename is None:
+        raise ValueError("Need a file name!")
+
+    try:
+        workfile = open(filename, "rb")
+    except IOError:
+        raise ValueError("File %s could not be opened!" % filename)
+
+    try:
+        try:
+            if os.fstat(workfile.fileno()).st_size == 0:
+                return ''
+            return mmap.mmap(workfile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, mmap.error):
+            raise ValueError("File %s could not be mapped!" % filename)
+    finally:
+        # the map stays valid after the file is closed
+        workfile.close()
+
+class MappedLines:
+    """The lines of a memory map, see mapFile. Iterating yields the lines with
+    their line ends, like iterating over a file. The iteration uses the
+    position of the map, so only one iteration at a time may use a map"""
+
+    def __init__(self, map=''):
+        self.map = map
+
+    def __iter__(self):
+        if len(self.map) == 0:
+            return iter(())
+        self.map.seek(0)
+        return iter(self.map.readline, '')
+
+    def tell(self):
+        """returns the number of bytes read by the iteration"""
+        if len(self.map) == 0:
+            return 0
+        return self.map.tell()
+
+#
+# The modules see every file with '\n' line ends and without a byte order
+# mark. The line end of the first line is taken for the whole file. If all
+# lines of the file end that way, the line ends are changed back when the
+# file is written, else the lines are left as they are. The files are
+# never decoded, so any encoding that is a superset of ASCII (UTF-8,
+# Latin-1, ...) passes through unchanged.
+#
+UTF8_BOM = '\xef\xbb\xbf'
+
+def detectFormat(head=''):
+    """returns the byte order mark and the line end of a file from its first
+    bytes. head can be a string or a memory map"""
+    bom = ''
+    if head[:len(UTF8_BOM)] == UTF8_BOM:
+        bom = UTF8_BOM
+
+    newline = '\n'
+    end = head.find('\n')
+    if end > 0 and head[end - 1] == '\r':
+        newline = '\r\n'
+
+    return bom, newline
+
+def decode(content='', bom='', newline='\n'):
+    """returns the content without byte order mark and with '\n' line ends,
+    and the line end that encode must restore"""
+    if len(bom) > 0:
+        content = content[len(bom):]
+
+    if newline != '\n':
+        if content.count('\n') == content.count(newline):
+            content = content.replace(newline, '\n')
+        else:
+            # mixed line ends, leave them alone
+            newline = '\n'
+
+    return content, newline
+
+def decodeLines(lines=(), bom='', newline='\n'):
+    """like decode, for the lines of a file that is only read"""
+    for line in lines:
+        if len(bom) > 0:
+            if line.startswith(bom):
+                line = line[len(bom):]
+            bom = ''
+        if newline != '\n' and line.endswith(newline):
+            line = line[:-len(newline)] + '\n'
+        yield line
+
+def encode(content='', bom='', newline='\n'):
+    """turns content as the modules see it back into the bytes of the file"""
+    if newline != '\n':
+        content = content.replace('\n', newline)
+    return bom + content
+
+#
+# If sync is set, every file written by save is flushed to disk before it
+# replaces the original. The directories of these files are collected and
+# synced once by syncDirectories, not once per file.
+#
+sync = False
+dirty = {}
+
+def setSync(flag=False):
+    global sync
+    sync = flag
+
+#
+# If a writer is set, save hands the file name and the content to it
+# instead of writing the file. util.Pipeline uses this to write the files
+# in a thread of its own, the writer then calls writeFile and times it
+# as the save phase.
+#
+writer = None
+
+def setWriter(function=None):
+    global writer
+    writer = function
+
+def save(filename=None, lines=None):
+    """writes the content to a temporary file next to filename and renames
+    it over the original, so the file is either changed completely or not at
+    all. The permissions of the original are kept"""
+
+    if filename is None or lines is None:
+        raise ValueError("Need a filename and some content")
+
+    if writer is not None:
+        writer(filename, lines)
     else:
+        timed('save', writeFile, filename, lines)
+
+def writeFile(filename=None, lines=None):
+    """does the work of save"""
+
+    # replace the file a symlink points to, not the link
+    filename = os.path.realpath(filename)
+    directory, name = os.path.split(filename)
+
+    try:
+        info = os.stat(filename)
+    except OSError:
+        info = None
+
+    try:
+        fd, tmpname = tempfile.mkstemp(prefix="." + name + ".", suffix=".tmp", dir=directory)
+    except (IOError, OSError):
+        raise ValueError("%s: Could not write file" % filename)
+
+    try:
+        workfile = os.fdopen(fd, "wb")
         try:
-            os.unlink(filename + ".bak")
-        except OSError:
-            raise ValueError("%s: Could not remove backup file" % filename)
+            workfile.write(lines)
+            workfile.flush()
+            if sync:
+                os.fsync(workfile.fileno())
+        finally:
+            workfile.close()
 
+        if info is not None:
+            os.chmod(tmpname, stat.S_IMODE(info.st_mode))
+            try:
+                os.chown(tmpname, info.st_uid, info.st_gid)
+            except OSError:
+                # only root may give a file away
+                pass
 
+        os.rename(tmpname, filename)
+    except (IOError, OSError):
+        try:
+            os.unlink(tmpname)
+        except OSError:
+            pass
+        raise ValueError("%s: Could not write file" % filename)
 
+    if sync:
+        dirty[directory] = True
 
+def drainDirectories():
+    """returns the directories that still need to be synced and forgets them"""
+    directories = dirty.keys()
+    dirty.clear()
+    return directories
 
+def syncDirectories(directories=()):
+    """syncs the given directories and all directories that save has written to"""
+    for directory in dict.fromkeys(list(directories) + drainDirectories()).keys():
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            raise ValueError("%s: Could not sync directory" % directory)
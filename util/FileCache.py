@@ -0,0 +1,159 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+import os
+import cPickle
+import hashlib
+
+# Bump this whenever the format of the entries or the output of the
+# modules changes, it invalidates all existing cache files.
+CACHE_VERSION = 3
+
+DEFAULT_SIZE = 1000000
+
+def digest(content=None):
+    return hashlib.md5(content).hexdigest()
+
+class FileCache:
+    """Remembers the files that a module has processed without changing
+    them, together with the output the module wrote for them.
+
+    An entry is found by the module key and the full file name and holds
+    mtime, size, an md5 digest of the file contents and the result of the
+    module for the file. A file whose
+    mtime and size did not change, or whose contents still have the same
+    digest, does not need to be processed again; the recorded output is
+    written and the recorded result is passed to the module instead."""
+
+    def __init__(self, filename=None, key='', size=DEFAULT_SIZE):
+        if filename is None:
+            raise ValueError("No cache file name given")
+
+        self.filename = filename
+        self.key = key
+        self.size = size
+
+        self.entries = {}
+        self.updates = []
+        self.run = 0
+
+        try:
+            cachefile = open(filename, "rb")
+        except IOError:
+            return
+
+        try:
+            try:
+                data = cPickle.load(cachefile)
+            except (cPickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+                # A broken cache is not worth an abort, just start over
+                return
+        finally:
+            cachefile.close()
+
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return
+
+        self.entries = data['entries']
+        self.run = data['run'] + 1
+
+    def lookup(self, source=None):
+        """returns the recorded output and result for a SourceFile as a tuple if the
+        file has not changed since it was processed for the last time, else None"""
+
+        index = (self.key, source.fullfile)
+
+        try:
+            mtime, size, checksum, output, result, used = self.entries[index]
+        except KeyError:
+            return None
+
+        try:
+            stat = os.stat(source.fullfile)
+        except OSError:
+            return None
+
+        if stat.st_mtime != mtime or stat.st_size != size:
+            # touched, but maybe still the same contents
+            if checksum is None or stat.st_size != size or digest(source.getView()) != checksum:
+                return None
+
+        self.update(index, (stat.st_mtime, stat.st_size, checksum, output, result, self.run))
+        return output, result
+
+    def store(self, source=None, output='', result=None):
+        """records that a SourceFile has been processed without a change"""
+
+        stat = os.stat(source.fullfile)
+
+        # if the module did not need the contents, stat alone decides
+        if source.isLoaded():
+            checksum = digest(source.getView())
+        else:
+            checksum = None
+
+        self.update((self.key, source.fullfile), (stat.st_mtime, stat.st_size, checksum, output, result, self.run))
+
+    def update(self, index=None, entry=None):
+        self.entries[index] = entry
+        self.updates.append((index, entry))
+
+    def drain(self):
+        """returns all entries changed since the last call. Used to pass the
+        results of a worker process on to the cache of the main process"""
+        updates = self.updates
+        self.updates = []
+        return updates
+
+    def merge(self, updates=()):
+        for index, entry in updates:
+            self.entries[index] = entry
+
+    def save(self):
+        """writes the cache back. If it holds more than size entries, the entries
+        that have not been used for the longest time are dropped"""
+
+        if len(self.entries) > self.size:
+            used = [ (entry[5], index) for index, entry in self.entries.items() ]
+            used.sort()
+            for run, index in used[:len(used) - self.size]:
+                del self.entries[index]
+
+        tmpname = self.filename + ".tmp"
+        try:
+            cachefile = open(tmpname, "wb")
+            try:
+                cPickle.dump({ 'version': CACHE_VERSION,
+                               'run': self.run,
+                               'entries': self.entries }, cachefile, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                cachefile.close()
+            os.rename(tmpname, self.filename)
+        except (IOError, OSError):
+            raise ValueError("%s: Could not write cache file" % self.filename)
+
+def clearCache(filename=None):
+    """removes a cache file"""
+    try:
+        os.unlink(filename)
+    except OSError, error:
+        if error.errno != 2:  # ENOENT
+            raise ValueError("%s: Could not remove cache file" % filename)
@@ -0,0 +1,68 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+#
+# Sources for the list of files to process when the tree should not be
+# walked completely. All functions return file names relative to the
+# given tree (or absolute file names).
+#
+
+import subprocess
+
+def runGit(tree=None, args=()):
+    """runs git in the tree and returns the NUL separated file names it prints"""
+    if tree is None:
+        raise ValueError("No directory for git given")
+
+    try:
+        git = subprocess.Popen([ "git" ] + list(args), cwd=tree,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError, error:
+        raise ValueError("Could not run git: %s" % error)
+
+    output, errors = git.communicate()
+    if git.returncode != 0:
+        raise ValueError("git %s failed: %s" % (" ".join(args), errors.strip()))
+
+    return [ name for name in output.split('\0') if len(name) > 0 ]
+
+def gitChangedFiles(tree=None, revision=None):
+    """returns the files in the tree that have been added or changed since revision"""
+    if revision is None:
+        raise ValueError("No revision given")
+
+    return runGit(tree, [ "diff", "--name-only", "--relative", "-z", "--diff-filter=ACMRT", revision, "--" ])
+
+def gitStagedFiles(tree=None):
+    """returns the files in the tree that are added or changed in the git index"""
+    return runGit(tree, [ "diff", "--name-only", "--relative", "-z", "--diff-filter=ACMRT", "--cached", "--" ])
+
+def readFileList(stream=None):
+    """reads file names from a stream, one per line. Empty lines are ignored"""
+    if stream is None:
+        raise ValueError("No stream given")
+
+    names = []
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if len(line) > 0:
+            names.append(line)
+    return names
@@ -0,0 +1,178 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+import os, re, string
+from ConfigParser import RawConfigParser, Error
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = dict
+
+# The signatures that are used if no other file is selected
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "etc", "licenses.txt")
+
+blanks = re.compile('\s+')
+words = re.compile('[a-z0-9]+')
+
+# turns everything that is not part of a word into a blank, so that the
+# words of a lower case text are found by split
+wordChars = string.ascii_lowercase + string.digits
+nonWords = string.maketrans(''.join([ chr(c) for c in range(256) if chr(c) not in wordChars ]),
+                            ' ' * (256 - len(wordChars)))
+
+class Signature:
+    """A single license from the signature file"""
+    def __init__(self, name=None, tokens=(), match=(), exclude=()):
+        self.name = name
+        self.tokens = frozenset(tokens)
+        # the tokens in the order of the file, the first one is the most special
+        self.tokenList = tuple(tokens)
+        self.match = [ re.compile(patt, re.I) for patt in match ]
+        self.exclude = [ re.compile(patt, re.I) for patt in exclude ]
+
+    def matches(self, text=''):
+        for patt in self.match:
+            if not patt.search(text):
+                return False
+        for patt in self.exclude:
+            if patt.search(text):
+                return False
+        return True
+
+class LicenseSignatures:
+    """Identifies licenses by the signatures read from a file. Every section
+    of the file describes one license:
+
+    [MIT]
+    tokens = permission hereby granted charge
+    match = Permission is hereby granted, free of charge
+
+    A comment block is a license if it contains all words listed in tokens
+    and every regular expression of match (one per line), but none of the
+    optional exclude expressions. The expressions are matched ignoring case
+    against the comment with all whitespace squeezed to a single blank. The
+    sections are tried in the order of the file.
+
+    Every signature is indexed by the one of its tokens that the fewest
+    other signatures share, the first one listed if there are several. A
+    comment block is only checked against the signatures whose index token
+    it contains, so adding licenses does not slow down the blocks that
+    mention none of their words"""
+
+    def __init__(self, filename=DEFAULT_FILE):
+        self.filename = filename
+
+        parser = RawConfigParser(dict_type=OrderedDict)
+        try:
+            if len(parser.read(filename)) == 0:
+                raise ValueError("%s: Could not read license signatures" % filename)
+        except Error, msg:
+            raise ValueError("%s: Broken license signature file: %s" % (filename, msg))
+
+        self.signatures = []
+        for name in parser.sections():
+            options = dict(parser.items(name))
+            if 'match' not in options:
+                raise ValueError("%s: License %s has no match entry" % (filename, name))
+
+            tokens = options.get('tokens', '').lower().split()
+            if len(tokens) == 0:
+                raise ValueError("%s: License %s has no tokens entry" % (filename, name))
+            for token in tokens:
+                if len(words.sub('', token)) > 0:
+                    raise ValueError("%s: License %s has a token that is not a word: %s" % (filename, name, token))
+
+            try:
+                self.signatures.append(Signature(name, tokens,
+                                                 self.lines(options['match']),
+                                                 self.lines(options.get('exclude', ''))))
+            except re.error, msg:
+                raise ValueError("%s: License %s has a broken pattern: %s" % (filename, name, msg))
+
+        self.buildIndex()
+
+        # the cache key of the modules that report the license names
+        self.key = repr([ (s.name, sorted(s.tokens), [ p.pattern for p in s.match ], [ p.pattern for p in s.exclude ])
+                          for s in self.signatures ])
+
+    def lines(self, value=''):
+        return [ line.strip() for line in value.splitlines() if len(line.strip()) > 0 ]
+
+    def buildIndex(self):
+        """files every signature under its rarest token. self.index maps the
+        token to (position in the file, signature) tuples"""
+        shared = {}
+        for signature in self.signatures:
+            for token in signature.tokens:
+                shared[token] = shared.get(token, 0) + 1
+
+        self.index = {}
+        for position, signature in enumerate(self.signatures):
+            key = min([ (shared[token], i, token) for i, token in enumerate(signature.tokenList) ])[2]
+            self.index.setdefault(key, []).append((position, signature))
+
+        self.keys = frozenset(self.index.keys())
+
+    def classify(self, lines='', lower=None):
+        """returns the name of the license in the joined lines of a comment
+        block or None. lower are the lines in lower case, if the caller
+        already has them"""
+        if lower is None:
+            lower = lines.lower()
+
+        found = frozenset(lower.translate(nonWords).split())
+        keys = found & self.keys
+        if len(keys) == 0:
+            return None
+
+        candidates = []
+        for key in keys:
+            candidates.extend(self.index[key])
+        candidates.sort()
+
+        text = None
+        for position, signature in candidates:
+            if signature.tokens <= found:
+                if text is None:
+                    text = blanks.sub(' ', lines)
+                if signature.matches(text):
+                    return signature.name
+
+        return None
+
+#
+# The signatures used by util.LicenseType, read when they are needed
+# for the first time
+#
+signatures = None
+
+def getSignatures():
+    global signatures
+    if signatures is None:
+        signatures = LicenseSignatures()
+    return signatures
+
+def setSignatures(filename=DEFAULT_FILE):
+    """selects a different signature file"""
+    global signatures
+    signatures = LicenseSignatures(filename)
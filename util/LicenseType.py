@@ -20,6 +20,8 @@
 # ======================================================================
 
 from util.CommentSplitter import CommentPart
+from util.LicenseSignatures import getSignatures
+from util.Stats import timed
 
 import re
 
@@ -30,6 +32,7 @@ UNKNOWN = 0
 APACHE = 1
 PUBLIC_DOMAIN = 2
 GPL = 3
+OTHER = 4  # from the license signature file
 
 # lic_flags
 APACHE_10 = 1
@@ -43,16 +46,42 @@ LGPL_21 = 4
 GPL_2   = 8
 
 
+#
+# All phrases the classification looks at are found in a single scan of
+# the lower case comment block for a few short keywords. The keywords are
+# plain strings, so the regular expression can skip quickly over the text
+# between them. Where a keyword is found, the phrases that start with it
+# are checked with the right case.
+#
+keywords = re.compile(r'licen|lisen|li\|en|\(c\)|copyright|version|apache|public domain|gnu |or +\(at')
+
+license = re.compile('li[c|s]ense')
+version20 = re.compile('Version 2.0')
+version12 = re.compile('Version 1.2')
+version11 = re.compile('Version 1.1')
+lowerVersion21 = re.compile('version 2\.1')
+orLater = re.compile('or +\(at +your +option\) +any +later +version')
+
+# what \s matches
+blanks = ' \t\n\r\f\v'
+
 class LicenseType:
     def __init__(self, comment=None):
 
         if comment is None:
             raise ValueError("A comment block to check must be passed in")
 
+        timed('LicenseType', self.classify, comment)
+
+    def classify(self, comment=()):
+
         lines = " ".join(comment)
+        lower = lines.lower()
 
-        self.isLicense = bool(re.search('\sli[c|s]ense', lines, re.I))
-        self.isCopyright = bool(re.search('\s*copyright\s', lines, re.I)) or bool(re.search('\s\(c\)\s', lines, re.I))
+        found = self.scan(lines, lower)
+
+        self.isLicense = 'license' in found
+        self.isCopyright = 'copyright' in found or '(c)' in found
 
         self.license = None
         self.lic_type = UNKNOWN
@@ -61,43 +90,43 @@ class LicenseType:
         if not self.isLicense:
             return
 
-        if re.search('Licensed under the Apache License.*Version 2.0', lines):
+        if found.get('apache20', len(lines) + 1) <= found.get('Version 2.0', -1):
             self.lic_type = APACHE
             self.lic_flags = APACHE_20
 
-            if re.search('Apache Software Foundation or its licensors', lines):
+            if 'asf' in found:
                 self.license = 'Apache 2.0a'
                 return
             else:
                 self.license = 'Apache 2.0'
                 return
 
-        elif re.search('The Apache Software License.*Version 1.2', lines):
+        elif found.get('apachesl', len(lines) + 1) <= found.get('Version 1.2', -1):
             self.lic_type = APACHE
             self.lic_flags = APACHE_12
             self.license = 'Apache 1.2'
             return
 
-        elif re.search('The Apache Software License.*Version 1.1', lines):
+        elif found.get('apachesl', len(lines) + 1) <= found.get('Version 1.1', -1):
             self.lic_type = APACHE
             self.lic_flags = APACHE_11
             self.license = 'Apache 1.1'
             return
 
-        elif re.search('Copyright.*The Apache Group', lines):
+        elif found.get('Copyright', len(lines) + 1) <= found.get('apachegroup', -1):
             self.lic_type = APACHE
             self.lic_flags = APACHE_10
             self.license = 'Apache 1.0'
             return
 
-        elif re.search('public domain', lines, re.I):
+        elif 'pd' in found:
             self.lic_type = PUBLIC_DOMAIN
             self.license = 'public domain'
             return
 
-        elif re.search('GNU Lesser General Public License', lines):
-            if re.search('version 2\.1', lines):
-                if re.search('or +\(at +your +option\) +any +later +version', lines):
+        elif 'lgpl' in found:
+            if 'version 2.1' in found:
+                if 'later' in found:
                     self.lic_type = GPL
                     self.lic_flags = LGPL_21 | OR_LATER
                     self.license =  "LGPL 2.1 or later"
@@ -109,8 +138,8 @@ class LicenseType:
                     self.license = "LGPL 2.1"
                     return
 
-            elif re.search('version 2(\.0)?', lines):
-                if re.search('or +\(at +your +option\) +any +later +version', lines):
+            elif 'version 2' in found:
+                if 'later' in found:
                     self.lic_type = GPL
                     self.lic_flags = LGPL_20 | OR_LATER
                     self.license = "LGPL 2.0 or later"
@@ -120,9 +149,9 @@ class LicenseType:
                     self.lic_flags = LGPL_20
                     self.license = "LGPL 2.0"
                     return
-        elif re.search('GNU General Public License', lines):
-            if re.search('Version 2(\.0)?', lines):
-                if re.search('or +\(at +your +option\) +any +later +version', lines):
+        elif 'gpl' in found:
+            if 'Version 2' in found:
+                if 'later' in found:
                     self.lic_type = GPL
                     self.lic_flags = GPL_2 | OR_LATER
                     self.license =  "GPL 2 or later"
@@ -132,4 +161,80 @@ class LicenseType:
                     self.lic_flags = GPL_2
                     self.license = "GPL 2"
                     return
-        return
+
+        # none of the licenses above, look it up in the signature file
+        name = getSignatures().classify(lines, lower)
+        if name is not None:
+            self.lic_type = OTHER
+            self.license = name
+
+    def scan(self, lines='', lower=None):
+        """Finds the phrases in the joined lines of a comment block. Returns a
+        dictionary with an entry for every phrase found. For phrases that start
+        an "A.*B" pattern, the entry is the end of the first occurence of A, for
+        phrases that end one, it is the start of the last occurence of B"""
+
+        found = {}
+        if lower is None:
+            lower = lines.lower()
+
+        # No keyword contains the start of another one. The keywords
+        # differ in their first character, except for the "li" ones
+        for match in keywords.finditer(lower):
+            pos = match.start()
+            first = lower[pos]
+
+            if first == 'l':
+                if pos > 0 and lines[pos - 1] in blanks and license.match(lower, pos):
+                    found['license'] = True
+                if 'apache20' not in found and lines.startswith('Licensed under the Apache License', pos):
+                    found['apache20'] = pos + len('Licensed under the Apache License')
+
+            elif first == 'v':
+                if version20.match(lines, pos):
+                    found['Version 2.0'] = pos
+                if version12.match(lines, pos):
+                    found['Version 1.2'] = pos
+                if version11.match(lines, pos):
+                    found['Version 1.1'] = pos
+                if lines.startswith('Version 2', pos):
+                    found['Version 2'] = True
+                if lines.startswith('version 2', pos):
+                    found['version 2'] = True
+                    if lowerVersion21.match(lines, pos):
+                        found['version 2.1'] = True
+
+            elif first == 'c':
+                end = match.end()
+                if end < len(lines) and lines[end] in blanks:
+                    found['copyright'] = True
+                if 'Copyright' not in found and lines.startswith('Copyright', pos):
+                    found['Copyright'] = end
+
+            elif first == '(':
+                end = match.end()
+                if pos > 0 and lines[pos - 1] in blanks and end < len(lines) and lines[end] in blanks:
+                    found['(c)'] = True
+
+            elif first == 'a':
+                if lines.startswith('Apache Software Foundation or its licensors', pos):
+                    found['asf'] = True
+                if pos >= 4 and lines.startswith('The ', pos - 4):
+                    if 'apachesl' not in found and lines.startswith('Apache Software License', pos):
+                        found['apachesl'] = pos + len('Apache Software License')
+                    if lines.startswith('Apache Group', pos):
+                        found['apachegroup'] = pos - 4
+
+            elif first == 'p':
+                found['pd'] = True
+
+            elif first == 'g':
+                if lines.startswith('GNU Lesser General Public License', pos):
+                    found['lgpl'] = True
+                if lines.startswith('GNU General Public License', pos):
+                    found['gpl'] = True
+
+            elif orLater.match(lines, pos):
+                found['later'] = True
+
+        return found
@@ -0,0 +1,125 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+import sys
+import multiprocessing
+from StringIO import StringIO
+
+from util.CallbackType import loadCallback
+from util.TreeBuilder import Traverse
+from util.File import setSync
+from util.Diff import bufferDiffs
+from util.Events import setRecording
+from util.Stats import setEnabled
+
+#
+# The Traverse object of a worker process. It is built once per worker
+# by _initWorker and then used for all files handed to this worker.
+#
+_traverse = None
+
+def _initWorker(module_name=None, cw=None):
+    global _traverse
+
+    # The main process has already built the module and shown everything
+    # the module prints while it is set up (usage, verbose messages). Don't
+    # repeat that once per worker.
+    setSync(cw.sync)
+    if cw.dry_run:
+        bufferDiffs(cw.dirtree)
+    setRecording(cw.events)
+    setEnabled(cw.stats)
+
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        _traverse = Traverse(loadCallback(module_name, cw), cache=cw.cache, sniffer=cw.sniffer)
+    finally:
+        sys.stdout = stdout
+
+def _processFile(entry):
+    """runs the callback for a single file, returns the output of the
+    callback, the error message if the callback gave up and the data
+    that must be passed on to the Traverse of the main process"""
+    root, file = entry
+
+    stdout = sys.stdout
+    sys.stdout = buffer = StringIO()
+    try:
+        try:
+            _traverse.traverse(root, file)
+        except ValueError, msg:
+            return buffer.getvalue(), str(msg), _traverse.drain()
+    finally:
+        sys.stdout = stdout
+
+    return buffer.getvalue(), None, _traverse.drain()
+
+class ParallelTraverse:
+    """Runs the callbacks for all files on a pool of worker processes. The output
+    of each file is collected in the worker and written by the main process in
+    the same order in which the TreeBuilder handed out the files"""
+
+    def __init__(self, traverse=None, module_name=None, cw=None, jobs=0):
+        if traverse is None or module_name is None or cw is None:
+            raise ValueError("Traverse, module name and CodeWrestler object must be defined!")
+
+        if jobs <= 0:
+            jobs = multiprocessing.cpu_count()
+
+        self.traverse = traverse
+        self.module_name = module_name
+        self.cw = cw
+        self.jobs = jobs
+
+    def run(self, files=None):
+        if files is None:
+            raise ValueError("no files to traverse given!")
+
+        try:
+            self.runPool(files)
+            self.traverse.callback.finish()
+        finally:
+            self.traverse.finish()
+
+    def runPool(self, files=None):
+        # Walk the tree before starting the workers, so that messages
+        # from the TreeBuilder don't end up between the results
+        files = list(files)
+
+        if len(files) == 0:
+            return
+
+        # Small chunks keep the output flowing, large chunks keep the
+        # overhead of passing files to the workers down.
+        chunksize = max(1, min(64, len(files) // (self.jobs * 8)))
+
+        pool = multiprocessing.Pool(self.jobs, _initWorker, (self.module_name, self.cw))
+        try:
+            for output, error, data in pool.imap(_processFile, files, chunksize):
+                sys.stdout.write(output)
+                self.traverse.merge(data)
+                if error is not None:
+                    raise ValueError(error)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
@@ -20,6 +20,7 @@
 # ======================================================================
 
 import re
+from util.ExcludeMatcher import splitLiteral
 
 class PatternDefinition:
     """ Defines a single pattern """
@@ -67,6 +68,14 @@ class PatternDefinition:
         if self.trailerComment is not None:
             self.trailerCommentMatch = re.compile('(.*?)\s*' + re.escape(self.trailerComment) + '\s*$')
 
+        # Markers that neither start nor end with a blank are found with
+        # string methods; the regular expressions are only needed for the
+        # others, where the blanks around the marker can match differently
+        self.plain = True
+        for marker in (self.openComment, self.closeComment, self.leaderComment):
+            if marker is not None and (len(marker) == 0 or marker[0].isspace() or marker[-1].isspace()):
+                self.plain = False
+
         self.indentBeforeOpen    = self.safeGetArray(pattArray, 'indent', 0)
         self.indentBeforeLeader  = self.safeGetArray(pattArray, 'indent', 1)
         self.indentAfterLeader   = self.safeGetArray(pattArray, 'indent', 2)
@@ -74,6 +83,64 @@ class PatternDefinition:
         self.indentBeforeClose   = self.safeGetArray(pattArray, 'indent', 4)
 
 
+    def matchOpen(self, line=''):
+        """returns the blanks in front of the open comment if the line opens
+        a comment, else None. Same as openCommentMatch"""
+        if not self.plain:
+            match = self.openCommentMatch.search(line)
+            if match:
+                return match.group(1)
+            return None
+
+        # most lines do not contain the marker at all
+        if self.openComment not in line:
+            return None
+
+        text = line.lstrip()
+        if self.closeComment is not None:
+            if text.rstrip() != self.openComment:
+                return None
+        elif not text.startswith(self.openComment):
+            return None
+
+        return line[:len(line) - len(text)]
+
+    def matchClose(self, line=''):
+        """returns True if the line ends with the close comment. Same as closeCommentMatch"""
+        if not self.plain:
+            return self.closeCommentMatch.search(line) is not None
+
+        if self.closeComment not in line:
+            return False
+        return line.rstrip().endswith(self.closeComment)
+
+    def matchLeader(self, line=''):
+        """returns the blanks in front of the leader comment and the rest of the
+        line without its line end as a tuple if the line starts with the leader
+        comment, else None. Same as leaderCommentMatch"""
+        if not self.plain:
+            match = self.leaderCommentMatch.search(line)
+            if match:
+                return match.group(1), match.group(2)
+            return None
+
+        if self.leaderComment not in line:
+            return None
+
+        text = line.lstrip()
+        if not text.startswith(self.leaderComment):
+            return None
+
+        rest = text[len(self.leaderComment):]
+        if rest.endswith('\n'):
+            rest = rest[:-1]
+        # '.' does not match a line end inside of the line
+        if '\n' in rest:
+            return None
+
+        return line[:len(line) - len(text)], rest
+
+
 class Pattern:
     """Holds all the well known pattern types and offers matching methods to find out what type of file a file name is"""
 
@@ -102,7 +169,7 @@ class Pattern:
         'javascript': ( '\.js$', '\.javascript$',
                         ),
 
-        'java': ( '\.java$', '\.groovy$', '\.gy', '\.jj$', '\.jjt$',
+        'java': ( '\.java$', '\.groovy$', '\.gy$', '\.jj$', '\.jjt$',
                   ),
 
         'jelly': ( '\.jelly$',
@@ -218,19 +285,83 @@ class Pattern:
         'None': PatternDefinition({}),
         }
 
-    def __init__(self):
-        self.pattern = {}
-        for pattern, pattlist in self.pattern_def.items():
-            for ending in pattlist:
-                self.pattern[re.compile(ending)] = pattern
+    # Index built from pattern_def, shared by all Pattern objects
+    names = None        # exact file names
+    extensions = None   # file name endings starting with a dot
+    fallback = None     # (compiled pattern, type) for everything else
 
+    # file name -> type for every file name seen so far
+    types = {}
+
+    def __init__(self):
+        if Pattern.names is None:
+            Pattern.buildIndex()
+
+    def buildIndex(cls):
+        """Sorts all patterns into a table of exact file names, a table of file endings
+        and a list of regular expressions for the patterns that are none of these"""
+        names = {}
+        extensions = {}
+        fallback = []
+
+        types = cls.pattern_def.keys()
+        types.sort()
+
+        for type in types:
+            for ending in cls.pattern_def[type]:
+                literal = splitLiteral(ending)
+                if literal is not None:
+                    text, anchoredStart, anchoredEnd = literal
+                    if anchoredStart and anchoredEnd:
+                        table = names
+                    elif anchoredEnd and text.startswith('.'):
+                        table = extensions
+                    else:
+                        table = None
+
+                    if table is not None:
+                        if table.has_key(text) and table[text] != type:
+                            raise ValueError("Pattern %s is defined for %s and %s" % (ending, table[text], type))
+                        table[text] = type
+                        continue
+
+                fallback.append((re.compile(ending), type))
+
+        cls.names = names
+        cls.extensions = extensions
+        cls.fallback = fallback
+
+    buildIndex = classmethod(buildIndex)
 
     def getType(self, file=None):
         """returns the file type for a given file name"""
         if file is None:
             raise ValueError("No file name supplied")
 
-        for patterns, type in self.pattern.items():
+        try:
+            return self.types[file]
+        except KeyError:
+            pass
+
+        type = self.findType(file)
+        self.types[file] = type
+        return type
+
+    def findType(self, file=None):
+        """looks up the file type in the index. The longest matching file ending wins"""
+        try:
+            return self.names[file]
+        except KeyError:
+            pass
+
+        index = file.find('.')
+        while index >= 0:
+            try:
+                return self.extensions[file[index:]]
+            except KeyError:
+                index = file.find('.', index + 1)
+
+        for patterns, type in self.fallback:
             if patterns.search(file):
                 return type
 
@@ -0,0 +1,192 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+import os
+import threading
+import Queue
+
+from util.Pattern import Pattern
+from util.File import readAhead, setWriter, writeFile
+from util.Sniffer import SNIFF_SIZE
+from util.Stats import timed, countReadAhead
+
+# Files of modules that read the whole file are read ahead only this far,
+# so that the reader does not run through a huge file for a long time
+READ_AHEAD_LIMIT = 16 * 1024 * 1024
+
+# put into a queue after the last entry
+END = None
+
+class PipelineTraverse:
+    """Runs the callbacks for all files in the main thread while a reader
+    thread reads the next files ahead and a writer thread writes back the
+    files the callback has changed. Both threads are at most depth files
+    ahead of or behind the callback. The output is the same as without the
+    pipeline.
+
+    The reader reads as much of a file as the module asks for with
+    readAhead, so that the module finds it in the cache of the operating
+    system, but keeps only the bytes the sniffer looks at. The modules
+    still read the files themselves, from a memory map or only as far as
+    they need them. Files that no module reads, because their type has no
+    comment syntax or because the sniffer skips them for their size, are
+    not read ahead"""
+
+    def __init__(self, traverse=None, depth=0):
+        if traverse is None:
+            raise ValueError("traverse must be defined!")
+
+        if depth <= 0:
+            raise ValueError("The pipeline needs a depth of at least 1")
+
+        self.traverse = traverse
+        self.depth = depth
+
+        # how far every file is read ahead
+        self.size = traverse.callback.readAhead()
+        if self.size <= 0:
+            self.size = READ_AHEAD_LIMIT
+        self.size = max(self.size, SNIFF_SIZE)
+
+        self.readQueue = Queue.Queue(depth)
+        self.writeQueue = Queue.Queue(depth)
+
+        # set by the main thread to stop the reader
+        self.stopped = False
+
+        # the first error of the writer thread
+        self.error = None
+
+    def run(self, files=None):
+        if files is None:
+            raise ValueError("no files to traverse given!")
+
+        try:
+            self.runPipeline(files)
+            self.traverse.callback.finish()
+        finally:
+            self.traverse.finish()
+
+    def runPipeline(self, files=None):
+        # Walk the tree before starting the reader, so that messages
+        # from the TreeBuilder don't end up between the results
+        files = list(files)
+
+        if len(files) == 0:
+            return
+
+        reader = threading.Thread(target=self.read, args=(files,), name="PipelineReader")
+        writer = threading.Thread(target=self.write, name="PipelineWriter")
+        reader.setDaemon(True)
+        writer.setDaemon(True)
+
+        reader.start()
+        writer.start()
+        setWriter(self.writeBehind)
+        try:
+            while True:
+                entry = self.readQueue.get()
+                if entry is END:
+                    break
+                self.checkWriter()
+
+                root, file, head, count = entry
+                countReadAhead(count)
+                self.traverse.traverse(root, file, head)
+                self.traverse.mergeResults(self.traverse.takeResults())
+        finally:
+            setWriter(None)
+            self.stopReader(reader)
+
+            # files changed before an error are still written, like
+            # they would have been without the pipeline
+            self.writeQueue.put(END)
+            writer.join()
+
+        self.checkWriter()
+
+    def read(self, files=()):
+        """reader thread: reads the files ahead and hands on their first bytes
+        and the number of bytes read"""
+        pattern = Pattern()
+        try:
+            for root, file in files:
+                if self.stopped:
+                    return
+                fullfile = os.path.join(root, file)
+                head, count = None, 0
+                if self.isRead(fullfile, pattern.getType(file), pattern):
+                    head, count = readAhead(fullfile, self.size, SNIFF_SIZE)
+                self.readQueue.put((root, file, head, count))
+        finally:
+            self.readQueue.put(END)
+
+    def isRead(self, fullfile=None, type=None, pattern=None):
+        """returns True if a module will read the file, see Traverse.skipped"""
+        if pattern.getDefinition(type).openComment is None:
+            return False
+
+        sniffer = self.traverse.sniffer
+        if sniffer is not None and sniffer.getMaxSize(type) > 0:
+            try:
+                return os.path.getsize(fullfile) <= sniffer.getMaxSize(type)
+            except OSError:
+                return False
+
+        return True
+
+    def stopReader(self, reader=None):
+        """stops the reader thread, which may wait for room in the full queue"""
+        self.stopped = True
+        while reader.isAlive():
+            try:
+                self.readQueue.get(True, 0.1)
+            except Queue.Empty:
+                pass
+        reader.join()
+
+    def writeBehind(self, filename=None, lines=None):
+        """called by util.File.save in the main thread, waits while the
+        writer thread is depth files behind"""
+        self.checkWriter()
+        self.writeQueue.put((filename, lines))
+
+    def write(self):
+        """writer thread: writes the files handed over by writeBehind. After
+        an error, the remaining files are not written"""
+        while True:
+            entry = self.writeQueue.get()
+            if entry is END:
+                return
+            if self.error is not None:
+                continue
+
+            filename, lines = entry
+            try:
+                timed('save', writeFile, filename, lines)
+            except ValueError, msg:
+                self.error = str(msg)
+
+    def checkWriter(self):
+        """raises the error of the writer thread in the main thread"""
+        if self.error is not None:
+            raise ValueError(self.error)
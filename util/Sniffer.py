@@ -0,0 +1,111 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+import os
+
+from util.Stats import countReadBytes
+
+# how many bytes at the start of a file are looked at
+SNIFF_SIZE = 8192
+
+# byte order marks of encodings whose lines can not be processed as bytes.
+# The UTF-32 marks must come first, the little endian one starts with the
+# UTF-16 mark
+byteOrderMarks = (
+    ('\xff\xfe\x00\x00', 'utf-32'),
+    ('\x00\x00\xfe\xff', 'utf-32'),
+    ('\xff\xfe', 'utf-16'),
+    ('\xfe\xff', 'utf-16'),
+    )
+
+class Sniffer:
+    """Decides before any module sees a file whether the file should be
+    skipped. A file is skipped if it is larger than the size limit for its
+    type, if it starts with a UTF-16 or UTF-32 byte order mark or if its
+    first block contains a NUL byte, which text files never do"""
+
+    def __init__(self, binary=True, verbose=False):
+        self.binary = binary
+        self.verbose = verbose
+
+        self.maxSize = 0     # limit for all types, 0 is no limit
+        self.maxSizes = {}   # type -> limit
+
+    def setMaxSize(self, type=None, size=0):
+        """sets the size limit in bytes for a file type, or for all types
+        that have no limit of their own if type is None"""
+        if type is None:
+            self.maxSize = size
+        else:
+            self.maxSizes[type] = size
+
+    def getMaxSize(self, type=None):
+        """returns the size limit in bytes for a file type, 0 is no limit"""
+        return self.maxSizes.get(type, self.maxSize)
+
+    def isActive(self):
+        """returns True if the sniffer has anything to check"""
+        return self.binary or self.maxSize > 0 or len(self.maxSizes) > 0
+
+    def key(self):
+        """returns everything that decides which files are skipped, for the cache key"""
+        sizes = self.maxSizes.items()
+        sizes.sort()
+        return (self.binary, self.maxSize, sizes)
+
+    def check(self, fullfile=None, type=None, head=None, content=True):
+        """returns the reason for skipping the file, or None if it should be
+        processed. A file that can not be read is left to the modules. head
+        are the bytes of the file if they have already been read. If content
+        is False, no module reads the file and only its size is checked"""
+        if fullfile is None:
+            raise ValueError("No file name given")
+
+        limit = self.getMaxSize(type)
+        if limit > 0:
+            try:
+                if os.path.getsize(fullfile) > limit:
+                    return "size"
+            except OSError:
+                return None
+
+        if not self.binary or not content:
+            return None
+
+        if head is None:
+            try:
+                workfile = open(fullfile, "rb")
+                try:
+                    head = workfile.read(SNIFF_SIZE)
+                finally:
+                    workfile.close()
+            except IOError:
+                return None
+            countReadBytes(len(head))
+
+        for mark, encoding in byteOrderMarks:
+            if head.startswith(mark):
+                return encoding
+
+        if head.find('\0', 0, SNIFF_SIZE) >= 0:
+            return "binary"
+
+        return None
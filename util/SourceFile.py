@@ -0,0 +1,189 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+import os
+from cStringIO import StringIO
+
+from util.CommentSplitter import CommentSplitter
+from util.File import loadContent, mapFile, MappedLines, save
+from util.File import detectFormat, decode, decodeLines, encode
+import util.Diff
+from util.Stats import timed, timedIterator, countRead, countReadBytes, countWritten
+
+class SourceFile:
+    """A file that is processed by one or more modules. The file is read
+    from disk when a module asks for its contents for the first time and
+    written back only once, after all modules are done with it"""
+
+    def __init__(self, root=None, file=None, type=None):
+        if root is None or file is None:
+            raise ValueError("SourceFile needs a root and a file!")
+
+        self.root = root
+        self.file = file
+        self.type = type
+        self.fullfile = os.path.join(root, file)
+
+        self.lines = None
+        self.content = None
+        self.view = None
+
+        # byte order mark and line end of the file, see util.File
+        self.bom = ''
+        self.newline = '\n'
+        self.original = None
+        self.modified = False
+        self.written = False
+
+        # last parse result and the definition it was parsed with
+        self.definition = None
+        self.blocks = None
+
+    def getLines(self):
+        """returns the current content of the file as a list of lines"""
+        if self.lines is None:
+            content = timed('load', loadContent, self.fullfile)
+            countRead((content,))
+            self.bom, self.newline = detectFormat(content)
+            self.content, self.newline = decode(content, self.bom, self.newline)
+            self.lines = StringIO(self.content).readlines()
+        return self.lines
+
+    def isLoaded(self):
+        """returns True if a module has looked at the contents of the file"""
+        return self.lines is not None or self.view is not None
+
+    def getContent(self):
+        """returns the current content of the file as a string"""
+        if self.content is None:
+            self.content = "".join(self.getLines())
+        return self.content
+
+    def getView(self):
+        """returns the current content of the file for searching. If no module
+        has loaded the file, this is a read only memory map of the file on
+        disk, so a check that finds nothing to do never reads the file into
+        strings. Do not keep the view, it may be a map of a file that changes"""
+        if self.lines is not None:
+            return self.getContent()
+
+        if self.view is None:
+            view = timed('load', mapFile, self.fullfile)
+            if detectFormat(view) != ('', '\n'):
+                # the modules must see the file with '\n' line ends
+                return self.getContent()
+            self.view = view
+            countRead((self.view,))
+        return self.view
+
+    def getBlocks(self, definition=None):
+        """returns the file split into comment and data blocks. The result is
+        shared between all modules, use BlockList.copy() before changing it"""
+        if definition is None:
+            raise ValueError("no definition given")
+
+        if self.blocks is None or self.definition is not definition:
+            # a file that has not been loaded is split from its memory map,
+            # the data blocks then refer to the map instead of holding lines
+            view = self.getView()
+            if self.lines is None:
+                lines = MappedLines(view)
+            else:
+                lines = self.lines
+            self.blocks = timed('parse', CommentSplitter(definition).parse, lines)
+            self.definition = definition
+
+        return self.blocks
+
+    def iterHeaderBlocks(self, definition=None, limit=0, codeLines=0):
+        """returns an iterator over the comment and data blocks of the file. If
+        the file has not been loaded yet, it is read only as far as the blocks
+        are used. Splitting stops at the first block boundary after limit bytes
+        or after codeLines lines of code, 0 means no limit"""
+        if definition is None:
+            raise ValueError("no definition given")
+
+        if self.blocks is not None and self.definition is definition and limit <= 0 and codeLines <= 0:
+            return iter(self.blocks)
+
+        if self.lines is None:
+            blocks = self.iterMappedBlocks(definition, limit, codeLines)
+        else:
+            blocks = CommentSplitter(definition).blocks(self.lines, limit, codeLines)
+
+        # the time for reading the file while it is split is part of parse
+        return timedIterator('parse', blocks)
+
+    def iterMappedBlocks(self, definition=None, limit=0, codeLines=0):
+        """splits the file from a memory map. Only the bytes that the splitter
+        reads are counted as read"""
+        if self.view is None:
+            lines = MappedLines(mapFile(self.fullfile))
+        else:
+            lines = MappedLines(self.view)
+
+        bom, newline = detectFormat(lines.map)
+        if bom == '' and newline == '\n':
+            source = lines
+        else:
+            source = decodeLines(lines, bom, newline)
+
+        try:
+            for block in CommentSplitter(definition).blocks(source, limit, codeLines):
+                yield block
+        finally:
+            countReadBytes(lines.tell())
+
+    def setContent(self, content=None):
+        """replaces the content of the file. The file is not written until save is called"""
+        if content is None:
+            raise ValueError("Need some content")
+
+        # the lines as they are on disk, needed for the diff of a dry run
+        if self.original is None:
+            self.original = self.getLines()
+
+        self.content = content
+        self.lines = StringIO(content).readlines()
+        self.modified = True
+
+        self.definition = None
+        self.blocks = None
+
+    def encodeLines(self, lines=()):
+        """returns lines as they are written to the file"""
+        if self.bom == '' and self.newline == '\n':
+            return lines
+        return StringIO(encode("".join(lines), self.bom, self.newline)).readlines()
+
+    def save(self):
+        """writes the file back if a module has changed it. In a dry run, the
+        changes are written to the diff output instead"""
+        if self.modified:
+            if util.Diff.dryRun:
+                util.Diff.writeDiff(self.fullfile, self.encodeLines(self.original), self.encodeLines(self.lines))
+            else:
+                content = encode(self.content, self.bom, self.newline)
+                save(self.fullfile, content)
+                countWritten(content)
+            self.modified = False
+            # also set in a dry run, the cache must not remember a changed file
+            self.written = True
@@ -0,0 +1,202 @@
+#! /usr/bin/python
+
+# ======================================================================
+#
+# Copyright 2005 Henning Schmiedehausen <henning@schmiedehausen.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you
+# may not use this file except in compliance with the License.
+#
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# ======================================================================
+
+
+#
+# Run statistics for --stats. Every process collects the time spent in the
+# phases of a run (walking the tree, matching excludes, finding the file
+# type, loading, parsing, classifying licenses, saving), per file type and
+# per module, the slowest files, the files skipped by util.Sniffer and the
+# number of bytes read and written. The bytes that --pipeline reads ahead
+# are counted on their own, the modules read them again.
+# Worker processes pass their numbers on to the main process with the
+# other results of a file.
+#
+# If statistics are off, the functions below cost a single test of the
+# enabled flag; nothing is timed or counted.
+#
+
+import time, heapq
+
+# how many of the slowest files are listed
+SLOWEST = 10
+
+enabled = False
+
+class Stats:
+    def __init__(self):
+        self.phases = {}      # phase -> [ count, seconds ]
+        self.types = {}       # file type -> [ files, seconds ]
+        self.modules = {}     # module name -> [ files, seconds ]
+        self.slowest = []     # heap of (seconds, file)
+        self.bytesRead = 0
+        self.bytesReadAhead = 0
+        self.bytesWritten = 0
+        self.skipped = {}     # reason -> files
+
+    def addTime(self, table=None, key=None, seconds=0.0, count=1):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [ count, seconds ]
+        else:
+            entry[0] += count
+            entry[1] += seconds
+
+    def addFile(self, fullfile=None, seconds=0.0):
+        if len(self.slowest) < SLOWEST:
+            heapq.heappush(self.slowest, (seconds, fullfile))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, fullfile))
+
+    def merge(self, other=None):
+        for table, otherTable in ((self.phases, other.phases), (self.types, other.types), (self.modules, other.modules)):
+            for key, (count, seconds) in otherTable.items():
+                self.addTime(table, key, seconds, count)
+        for seconds, fullfile in other.slowest:
+            self.addFile(fullfile, seconds)
+        self.bytesRead += other.bytesRead
+        self.bytesReadAhead += other.bytesReadAhead
+        self.bytesWritten += other.bytesWritten
+        for reason, count in other.skipped.items():
+            self.skipped[reason] = self.skipped.get(reason, 0) + count
+
+    def write(self, stream=None):
+        stream.write("\nRun statistics\n")
+
+        for title, table in (("Phase", self.phases), ("File type", self.types), ("Module", self.modules)):
+            stream.write("\n    %-32s %8s %10s\n" % (title, "count", "seconds"))
+            entries = [ (seconds, str(key), count) for key, (count, seconds) in table.items() ]
+            entries.sort()
+            entries.reverse()
+            for seconds, key, count in entries:
+                stream.write("    %-32s %8d %10.3f\n" % (key, count, seconds))
+
+        stream.write("\n    Slowest files\n")
+        slowest = list(self.slowest)
+        slowest.sort()
+        slowest.reverse()
+        for seconds, fullfile in slowest:
+            stream.write("    %10.3f %s\n" % (seconds, fullfile))
+
+        if len(self.skipped) > 0:
+            stream.write("\n    %-32s %8s\n" % ("Skipped files", "count"))
+            for reason, count in sorted(self.skipped.items()):
+                stream.write("    %-32s %8d\n" % (reason, count))
+
+        stream.write("\n    Bytes read:    %12d\n" % self.bytesRead)
+        if self.bytesReadAhead > 0:
+            stream.write("    Read ahead:    %12d\n" % self.bytesReadAhead)
+        stream.write("    Bytes written: %12d\n" % self.bytesWritten)
+
+stats = Stats()
+
+def setEnabled(flag=False):
+    """switches statistics on or off and starts over. Worker processes call
+    this, so they don't report numbers of the main process again"""
+    global enabled, stats
+    enabled = flag
+    stats = Stats()
+
+def timed(phase=None, function=None, *args):
+    """calls function with args and adds the time taken to the phase"""
+    if not enabled:
+        return function(*args)
+
+    start = time.time()
+    try:
+        return function(*args)
+    finally:
+        stats.addTime(stats.phases, phase, time.time() - start)
+
+def timedIterator(phase=None, iterator=None):
+    """returns an iterator that adds the time taken by each step to the phase"""
+    if not enabled:
+        return iterator
+    return timeSteps(phase, iterator)
+
+def timeSteps(phase=None, iterator=None):
+    iterator = iter(iterator)
+    seconds = 0.0
+    try:
+        while True:
+            start = time.time()
+            try:
+                item = iterator.next()
+            finally:
+                seconds += time.time() - start
+            yield item
+    finally:
+        # the steps are counted as one call
+        stats.addTime(stats.phases, phase, seconds)
+
+def countRead(lines=()):
+    if enabled:
+        stats.bytesRead += sum(map(len, lines))
+
+def countReadBytes(count=0):
+    if enabled:
+        stats.bytesRead += count
+
+def countingIterator(lines=None):
+    """returns an iterator over lines that counts the bytes read"""
+    if not enabled:
+        return lines
+    return countSteps(lines)
+
+def countSteps(lines=None):
+    for line in lines:
+        stats.bytesRead += len(line)
+        yield line
+
+def countReadAhead(count=0):
+    if enabled:
+        stats.bytesReadAhead += count
+
+def countWritten(content=''):
+    if enabled:
+        stats.bytesWritten += len(content)
+
+def addFile(fullfile=None, type=None, seconds=0.0):
+    stats.addTime(stats.types, type, seconds)
+    stats.addFile(fullfile, seconds)
+
+def addSkipped(reason=None):
+    if enabled:
+        stats.skipped[reason] = stats.skipped.get(reason, 0) + 1
+
+def addModule(name=None, seconds=0.0):
+    stats.addTime(stats.modules, name, seconds)
+
+def drainStats():
+    """returns the statistics collected since the last call, None if statistics are off"""
+    global stats
+    if not enabled:
+        return None
+    result = stats
+    stats = Stats()
+    return result
+
+def mergeStats(other=None):
+    if other is not None:
+        stats.merge(other)
+
+def writeStats(stream=None):
+    stats.write(stream)
@@ -19,26 +19,164 @@
 #
 # ======================================================================
 
-import os, re
+import os, sys, time
+from StringIO import StringIO
+
 from util.Pattern import Pattern
+from util.ExcludeMatcher import ExcludeMatcher
+from util.SourceFile import SourceFile
+from util.File import drainDirectories, syncDirectories
+from util.Diff import drainDiffs, writeDiffs
+from util.Events import drainEvents, writeEvents
+import util.Stats
+from util.Stats import timed, timedIterator, drainStats, mergeStats
 
 class Traverse:
     """ Method called by the TreeBuilder to process the various files"""
-    def __init__(self, callback=None, mod_opts='', opts=''):
+    def __init__(self, callback=None, mod_opts='', opts='', cache=None, sniffer=None):
         self.pattern = Pattern()
 
         if callback is None:
             raise ValueError("callback must be defined!")
 
         self.callback = callback
+        self.cache = cache
+        self.sniffer = sniffer
+
+        # directories written to by worker processes that must be synced
+        self.directories = []
+
+        # results and events of the callback for the files processed since
+        # the last drain, one (result, events) tuple per file
+        self.results = []
 
-    def traverse(self, root=None, file=None):
+    def traverse(self, root=None, file=None, head=None):
+        """runs the callback on a file. head are the first bytes of the file
+        if they have already been read, they are handed to the sniffer"""
         if root is None or file is None:
             raise ValueError("traverse with illegal root or file!")
 
-        type = self.pattern.getType(file)
+        if util.Stats.enabled:
+            start = time.time()
+
+        type = timed('getType', self.pattern.getType, file)
+
+        if self.cache is None:
+            if not self.skipped(root, file, type, head):
+                self.callback.callback(root, file, type)
+                self.results.append((self.callback.drain(), drainEvents()))
+        else:
+            self.cachedCallback(root, file, type, head)
+
+        if util.Stats.enabled:
+            seconds = time.time() - start
+            util.Stats.addFile(os.path.join(root, file), type, seconds)
+            util.Stats.addModule(self.callback.getName(), seconds)
+
+    def cachedCallback(self, root=None, file=None, type=None, head=None):
+        """runs the callback on a file unless the cache already knows the
+        file. The output of the callback is recorded in the cache"""
+
+        source = SourceFile(root, file, type)
+
+        entry = timed('cache', self.cache.lookup, source)
+        if entry is not None:
+            output, result = entry
+            sys.stdout.write(output)
+            self.results.append(result)
+            return
+
+        # a file found in the cache has been sniffed before
+        if self.skipped(root, file, type, head):
+            return
+
+        stdout = sys.stdout
+        sys.stdout = buffer = StringIO()
+        try:
+            self.callback.process(source)
+            source.save()
+        finally:
+            sys.stdout = stdout
+            sys.stdout.write(buffer.getvalue())
+
+        result = (self.callback.drain(), drainEvents())
+        self.results.append(result)
+
+        if not source.written:
+            self.cache.store(source, buffer.getvalue(), result)
+
+    def skipped(self, root=None, file=None, type=None, head=None):
+        """returns True if the sniffer says that the file must not be processed"""
+        if self.sniffer is None:
+            return False
+
+        # the modules never read files of types without comment syntax
+        content = self.pattern.getDefinition(type).openComment is not None
+        if not content and self.sniffer.getMaxSize(type) <= 0:
+            return False
+
+        fullfile = os.path.join(root, file)
+        reason = timed('sniff', self.sniffer.check, fullfile, type, head, content)
+        if reason is None:
+            return False
+
+        util.Stats.addSkipped(reason)
+        if self.sniffer.verbose:
+            print "Skipped %s (%s)" % (fullfile, reason)
+        return True
+
+    def run(self, files=None):
+        """processes all (root, file) pairs handed in by the TreeBuilder"""
+        if files is None:
+            raise ValueError("no files to traverse given!")
+
+        try:
+            for root, file in files:
+                self.traverse(root, file)
+                self.mergeResults(self.takeResults())
+            self.callback.finish()
+        finally:
+            self.finish()
+
+    def takeResults(self):
+        results = self.results
+        self.results = []
+        return results
+
+    def mergeResults(self, results=()):
+        """hands the results of the callback back to it and writes its events"""
+        for result, events in results:
+            if result is not None:
+                self.callback.merge(result)
+            writeEvents(events)
 
-        self.callback.callback(root, file, type)
+    def drain(self):
+        """returns everything a worker process must pass on to the main process
+        after a file has been processed"""
+        if self.cache is None:
+            updates = None
+        else:
+            updates = self.cache.drain()
+        return updates, drainDirectories(), drainDiffs(), self.takeResults(), drainStats()
+
+    def merge(self, data=None):
+        """takes the data returned by drain in a worker process"""
+        updates, directories, diffs, results, stats = data
+        if updates is not None:
+            self.cache.merge(updates)
+        self.directories.extend(directories)
+        writeDiffs(diffs)
+        self.mergeResults(results)
+        mergeStats(stats)
+
+    def finish(self):
+        """called once after all files have been processed"""
+        directories = self.directories
+        self.directories = []
+        syncDirectories(directories)
+
+        if self.cache is not None:
+            self.cache.save()
 
 class TreeBuilder:
     """builds a tree of files to traverse"""
@@ -46,44 +184,107 @@ class TreeBuilder:
         if tree is None:
             raise ValueError("No directory for traversing supplied")
         self.tree = tree
-        self.ex_pattern = map(re.compile, excludes)
+        self.excludes = ExcludeMatcher(excludes)
         self.verbose = False
+        self.filelist = None
 
     def setVerbose(self, verbose=False):
         self.verbose = verbose
 
+    def setFileList(self, filelist=None):
+        """Process only the given files (relative to the tree or absolute)
+        instead of walking the whole tree"""
+        self.filelist = filelist
+
     def traverse(self, traverse=None):
         """runs through the directory tree, execute traverse on it"""
 
         if traverse is None:
             raise ValueError("traversing class must be defined!")
 
-        for root, dirs, files in os.walk(self.tree):
+        traverse.run(self.files())
 
-            # step 1: Remove all Directories that should not be parsed
-            dirloop = dirs[:]
-            for dir in dirloop:
-                for patt in self.ex_pattern:
-                    if patt.search(dir) or patt.search(os.path.join(root, dir)):
-                        dirs.remove(dir)
+    def files(self):
+        """yields (root, file) for every file that should be processed. Directories
+        and files are returned in sorted order, so every run sees the same sequence"""
 
-                        if self.verbose:
-                            print "Removed %s" % dir
+        if self.filelist is None:
+            return self.walkFiles()
+        else:
+            return self.listedFiles()
 
-                        break
+    def walkFiles(self):
+        for root, dirs, files in timedIterator('walk', os.walk(self.tree)):
+            dirs.sort()
+            files.sort()
 
-            # step 2: Remove all Files that should not be parsed
-            fileloop = files[:]
-            for file in fileloop:
-                for patt in self.ex_pattern:
-                    if patt.search(file) or patt.search(os.path.join(root, file)):
-                        files.remove(file)
+            # step 1: Remove all Directories that should not be parsed
+            dirs[:], removed = timed('exclude', self.excludes.filter, root, dirs)
+
+            if self.verbose:
+                for dir in removed:
+                    print "Removed %s" % dir
 
-                        if self.verbose:
-                            print "Removed %s" % file
+            # step 2: Remove all Files that should not be parsed
+            files, removed = timed('exclude', self.excludes.filter, root, files)
 
-                        break
+            if self.verbose:
+                for file in removed:
+                    print "Removed %s" % file
 
-            # step 3: Process the remaining files
+            # step 3: Hand out the remaining files
             for file in files:
-                traverse.traverse(root, file)
+                yield root, file
+
+    def listedFiles(self):
+        """Runs the files of the file list through the same checks as the
+        files found by walking the tree"""
+
+        tree = os.path.normpath(self.tree)
+
+        names = {}
+        for name in self.filelist:
+            name = os.path.normpath(os.path.join(tree, name))
+            if not name.startswith(os.path.join(tree, '')):
+                if self.verbose:
+                    print "Skipped %s (outside of %s)" % (name, tree)
+                continue
+            if not os.path.isfile(name):
+                if self.verbose:
+                    print "Skipped %s (not a file)" % name
+                continue
+            names[name] = True
+
+        names = names.keys()
+        names.sort()
+
+        # directory -> True if the directory or one of its parents is excluded
+        excluded = { tree: False }
+
+        for name in names:
+            root, file = os.path.split(name)
+
+            if self.dirExcluded(root, excluded):
+                continue
+
+            if timed('exclude', self.excludes.isExcluded, root, file):
+                if self.verbose:
+                    print "Removed %s" % file
+                continue
+
+            yield root, file
+
+    def dirExcluded(self, dir=None, excluded=None):
+        """checks whether a directory would have been removed while walking the tree"""
+        try:
+            return excluded[dir]
+        except KeyError:
+            pass
+
+        parent, name = os.path.split(dir)
+        result = self.dirExcluded(parent, excluded) or self.excludes.isExcluded(parent, name)
+        if result and not excluded[parent] and self.verbose:
+            print "Removed %s" % name
+
+        excluded[dir] = result
+        return result
@@ -21,8 +21,7 @@
 
 import os, re
 from util.Pattern import Pattern
-from util.CommentSplitter import CommentSplitter, DataPart, BlockList
-from util.File import load, save
+from util.CommentSplitter import DataPart, BlockList
 
 from util.CallbackType import CallbackType
 
@@ -40,20 +39,17 @@ class TopFormatter(CallbackType):
         self.pattern = Pattern()
         self.cw = cw
 
-    def callback(self, root=None, file=None, type=None):
-        if type != 'xml' and type != 'jelly':
+    def process(self, source=None):
+        if source.type != 'xml' and source.type != 'jelly':
             return
 
         if self.cw.verbose:
-            print "Processing %s" % file
+            print "Processing %s" % source.file
 
-        definition = self.pattern.getDefinition(type)
+        definition = self.pattern.getDefinition(source.type)
 
-        fullfile = os.path.join(root, file)
-        lines = load(fullfile)
-
-        commentSplitter = CommentSplitter(definition)
-        elementList = commentSplitter.parse(lines)
+        fullfile = source.fullfile
+        elementList = source.getBlocks(definition)
 
         # Search the "?xml" line
         xmlDefPattern = re.compile("^\s*\<\?xml\s")
@@ -100,6 +96,7 @@ class TopFormatter(CallbackType):
 
             newElements.append(block)
 
-        if newElements.toString() != "".join(lines):
-            print "%s: File reformatted" % fullfile
-            save(fullfile, newElements.toString())
+        result = newElements.changed(source.getView())
+        if result is not None:
+            self.report(fullfile, "reformatted", "File reformatted")
+            source.setContent(result)